@@ -1,17 +1,57 @@
 from __future__ import annotations
 
+import atexit
+import collections
+import contextlib
+import dataclasses
 import datetime
+import functools
 import json
 import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Deque, Iterator
 
 import streamlit as st
 import streamlit.components.v1 as components
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
-from config_loader import load_config
+from config_loader import extract_spreadsheet_id, load_config
 
-from processor import process_directory
+_MAX_SAVE_WORKERS = 8
+_IMPORT_POLL_INTERVAL_S = 0.5
+_MAX_LOG_LINES = 2000
+# Заголовок и описание одним элементом: меньше сообщений во фронтенд на каждый перезапуск
+_HEADER_MD = """
+# Импорт данных из Excel в Google Sheets
+
+**Описание**
+- Выберите Excel файлы (.xls/.xlsx)
+- Укажите период, если его нет в названии файла (можно отключить)
+"""
+# Экранирование для JS-шаблонной строки за один проход
+_CLIPBOARD_ESCAPES = str.maketrans({"\\": "\\\\", "`": "\\`", "$": "\\$", "\n": "\\n"})
+_MONTHS = (
+    "Январь",
+    "Февраль",
+    "Март",
+    "Апрель",
+    "Май",
+    "Июнь",
+    "Июль",
+    "Август",
+    "Сентябрь",
+    "Октябрь",
+    "Ноябрь",
+    "Декабрь",
+)
 
 
 def setup_logging() -> None:
@@ -21,77 +61,176 @@ def setup_logging() -> None:
     )
 
 
+class LogStore:
+    """Строки журнала с кэшированным общим текстом.
+
+    Строки дописываются из фонового потока импорта, поэтому признак
+    «текст устарел» хранится здесь, а не в session_state.
+    """
+
+    def __init__(self) -> None:
+        # Старые строки вытесняются, чтобы журнал не рос бесконечно
+        self._lines: Deque[str] = collections.deque(maxlen=_MAX_LOG_LINES)
+        self._text = ""
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def append(self, line: str) -> None:
+        with self._lock:
+            self._lines.append(line)
+            self._dirty = True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lines.clear()
+            self._text = ""
+            self._dirty = False
+
+    @property
+    def text(self) -> str:
+        """Склеивает строки только если с прошлого раза что-то добавилось."""
+        with self._lock:
+            if self._dirty:
+                self._text = "\n".join(self._lines)
+                self._dirty = False
+            return self._text
+
+
 class StreamlitLogHandler(logging.Handler):
-    """Логгер, который сохраняет сообщения в session_state для вывода в UI."""
+    """Один обработчик на процесс: раскладывает записи по журналам сессий.
+
+    Записи из потока скрипта находятся по session_id, записи из фонового
+    импорта — по потоку, к которому привязан журнал сессии.
+    """
 
-    def __init__(self, log_store: List[str]) -> None:
+    def __init__(self) -> None:
         super().__init__()
-        self.log_store = log_store
+        self._lock = threading.Lock()
+        self._session_stores: weakref.WeakValueDictionary[str, LogStore] = weakref.WeakValueDictionary()
+        self._thread_stores: dict[int, LogStore] = {}
+
+    def register_session(self, session_id: str, log_store: LogStore) -> None:
+        with self._lock:
+            self._session_stores[session_id] = log_store
+
+    @contextlib.contextmanager
+    def bind_current_thread(self, log_store: LogStore) -> Iterator[None]:
+        """Направляет записи текущего потока в журнал указанной сессии."""
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._thread_stores[thread_id] = log_store
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._thread_stores.pop(thread_id, None)
 
     def emit(self, record: logging.LogRecord) -> None:
-        message = self.format(record)
-        self.log_store.append(message)
+        with self._lock:
+            log_store = self._thread_stores.get(record.thread)
+            if log_store is None:
+                ctx = get_script_run_ctx(suppress_warning=True)
+                log_store = self._session_stores.get(ctx.session_id) if ctx else None
+        if log_store is None:
+            return
+        log_store.append(self.format(record))
+
+
+@st.cache_resource
+def _get_log_handler() -> StreamlitLogHandler:
+    """Настраивает логирование и подключает обработчик UI один раз за процесс."""
+    setup_logging()
+    handler = StreamlitLogHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(message)s"))
+    logging.getLogger().addHandler(handler)
+    return handler
 
 
 def setup_streamlit_logger() -> None:
-    """Инициализирует логирование в UI один раз за сессию."""
-    if "log_lines" not in st.session_state:
-        st.session_state["log_lines"] = []
+    """Инициализирует логирование (консоль и UI) один раз за сессию."""
+    if "log_store" not in st.session_state:
+        st.session_state["log_store"] = LogStore()
 
-    if st.session_state.get("log_handler_attached"):
+    if st.session_state.get("logging_ready"):
         return
 
-    handler = StreamlitLogHandler(st.session_state["log_lines"])
-    handler.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(message)s"))
-    logging.getLogger().addHandler(handler)
-    st.session_state["log_handler_attached"] = True
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        _get_log_handler().register_session(ctx.session_id, st.session_state["log_store"])
+    st.session_state["logging_ready"] = True
 
 
-def _render_period_picker() -> str:
-    """Возвращает выбранный период в формате 'Месяц ГГГГ'."""
-    months = [
-        "Январь",
-        "Февраль",
-        "Март",
-        "Апрель",
-        "Май",
-        "Июнь",
-        "Июль",
-        "Август",
-        "Сентябрь",
-        "Октябрь",
-        "Ноябрь",
-        "Декабрь",
-    ]
+def _default_period() -> tuple[int, int]:
+    """Возвращает индекс месяца и год предыдущего месяца."""
     today = datetime.date.today()
     first_day = today.replace(day=1)
     previous_month = first_day - datetime.timedelta(days=1)
-
     # Не зависим от локали
-    default_month = months[previous_month.month - 1]
-    default_year = previous_month.year
+    return previous_month.month - 1, previous_month.year
+
+
+def _render_period_picker() -> str:
+    """Возвращает выбранный период в формате 'Месяц ГГГГ'."""
+    default_month_index, default_year = _default_period()
 
-    month = st.selectbox("Месяц периода", months, index=months.index(default_month))
+    month = st.selectbox("Месяц периода", _MONTHS, index=default_month_index)
     year = st.number_input("Год периода", min_value=2000, max_value=2100, value=default_year, step=1)
     return f"{month} {int(year)}"
 
 
+@st.cache_data(show_spinner=False)
+def _load_app_config(config_path: str, mtime: float | None) -> dict:
+    """Читает config.json; mtime входит в ключ кэша, чтобы правки файла подхватывались."""
+    return load_config(config_path)
+
+
+def _get_app_config(config_path: str) -> dict:
+    try:
+        mtime = os.stat(config_path).st_mtime
+    except OSError:
+        mtime = None
+    return _load_app_config(config_path, mtime)
+
+
+def _save_uploaded_file(uploaded_file, target_dir: Path) -> None:
+    file_path = target_dir / uploaded_file.name
+    try:
+        # UploadedFile — это BytesIO без файлового дескриптора, поэтому sendfile недоступен;
+        # memoryview над его буфером пишется в файл без промежуточных копий bytes.
+        with file_path.open("wb") as handle, uploaded_file.getbuffer() as view:
+            handle.write(view)
+    finally:
+        uploaded_file.close()
+
+
 def _save_uploaded_files(uploaded_files: list, target_dir: Path) -> None:
-    """Сохраняет загруженные файлы в указанную папку."""
-    target_dir.mkdir(parents=True, exist_ok=True)
-    for uploaded_file in uploaded_files:
-        file_path = target_dir / uploaded_file.name
-        file_path.write_bytes(uploaded_file.getbuffer())
+    """Записывает загруженные файлы в папку импорта параллельно.
+
+    После записи буфер UploadedFile закрывается, поэтому сами объекты
+    не стоит хранить в session_state — читать их повторно нельзя.
+    """
+    workers = min(_MAX_SAVE_WORKERS, len(uploaded_files))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # list() нужен, чтобы ошибки записи не потерялись внутри map
+        list(executor.map(functools.partial(_save_uploaded_file, target_dir=target_dir), uploaded_files))
+
+
+@st.cache_resource
+def _process_temp_dir() -> Path:
+    """Временный каталог процесса (mkdtemp, права 0700); удаляется при завершении."""
+    temp_dir = Path(tempfile.mkdtemp(prefix="svodmp_"))
+    atexit.register(shutil.rmtree, temp_dir, ignore_errors=True)
+    return temp_dir
+
+
+def _new_upload_dir() -> Path:
+    """Папка загрузок одного импорта; удаляется, когда импорт завершится."""
+    return Path(tempfile.mkdtemp(prefix="uploads_", dir=_process_temp_dir()))
 
 
 def _copy_to_clipboard(text: str) -> None:
     """Копирует текст в буфер обмена через компонент HTML."""
-    escaped_text = (
-        text.replace("\\", "\\\\")
-        .replace("`", "\\`")
-        .replace("$", "\\$")
-        .replace("\n", "\\n")
-    )
+    escaped_text = text.translate(_CLIPBOARD_ESCAPES)
     html = (
         "<script>"
         f"navigator.clipboard.writeText(`{escaped_text}`);"
@@ -100,91 +239,185 @@ def _copy_to_clipboard(text: str) -> None:
     components.html(html, height=0)
 
 
-def _resolve_credentials_path(temp_path: Path) -> str | None:
-    """Возвращает путь к credentials (из Streamlit Secrets)."""
+def _read_credentials_secret() -> dict | str | None:
+    """Возвращает service account из Streamlit Secrets: JSON-строку или секцию-объект."""
     secrets = st.secrets
 
     # Вариант 1: строковый JSON целиком
     if "credentials_json" in secrets:
         value = secrets["credentials_json"]
         if isinstance(value, str):
-            credentials_file = temp_path / "credentials.json"
-            credentials_file.write_text(value, encoding="utf-8")
-            return str(credentials_file)
+            return value
 
     # Вариант 2: строка с JSON в другом ключе
     if "credentials" in secrets:
         value = secrets["credentials"]
         if isinstance(value, str):
-            credentials_file = temp_path / "credentials.json"
-            credentials_file.write_text(value, encoding="utf-8")
-            return str(credentials_file)
+            return value
 
     # Вариант 3: секция-объект (как у тебя [google])
     for key in ("google", "gcp_service_account", "SVODMP"):
         if key in secrets:
             obj = secrets[key]  # это Secrets / mapping-подобный объект
-            credentials_file = temp_path / "credentials.json"
-            # превращаем его в обычный JSON
-            credentials_file.write_text(
-                json.dumps(dict(obj), ensure_ascii=False),
-                encoding="utf-8",
-            )
-            return str(credentials_file)
-
-    st.error("Не найдены credentials в Streamlit Secrets.")
-    st.info(
-        "Добавьте JSON service account в Secrets (секция [google]/[gcp_service_account]/[SVODMP] "
-        "или ключ credentials_json / credentials)."
-    )
-    return None
+            return dict(obj)
 
+    return None
 
 
-def _validate_credentials_json(credentials_path: str) -> bool:
-    """Проверяет, что credentials файл содержит валидный JSON."""
+def _parse_credentials_json(raw_content: str) -> dict | None:
+    """Разбирает строковый JSON service account."""
+    stripped_content = raw_content.strip()
+    if not stripped_content:
+        st.error("Файл credentials пустой. Загрузите полный JSON service account.")
+        return None
     try:
-        raw_content = Path(credentials_path).read_text(encoding="utf-8")
-        stripped_content = raw_content.strip()
-        if not stripped_content:
-            st.error("Файл credentials пустой. Загрузите полный JSON service account.")
-            return False
-        if not stripped_content.startswith("{"):
-            st.error("Файл credentials должен быть JSON-объектом. Проверьте формат файла.")
-            return False
-        payload = json.loads(raw_content)
-        private_key = payload.get("private_key")
-        if isinstance(private_key, str):
-            if "BEGIN PRIVATE KEY" not in private_key or "END PRIVATE KEY" not in private_key:
-                st.error(
-                    "В credentials отсутствует корректный private_key в формате PEM. "
-                    "Проверьте, что ключ из service account не обрезан."
-                )
-                return False
-        else:
-            st.error("В credentials нет поля private_key или оно некорректного типа.")
-            return False
-    except (OSError, json.JSONDecodeError) as exc:
+        payload = json.loads(stripped_content)
+    except json.JSONDecodeError as exc:
         st.error(f"Некорректный JSON в credentials файле: {exc}")
         st.info("Проверьте, что вы загрузили JSON service account, а не пустой файл.")
+        return None
+    if not isinstance(payload, dict):
+        st.error("Файл credentials должен быть JSON-объектом. Проверьте формат файла.")
+        return None
+    return payload
+
+
+def _resolve_credentials_path() -> tuple[str, dict] | None:
+    """Возвращает путь к credentials (из Streamlit Secrets) и их содержимое."""
+    secret = _read_credentials_secret()
+    if secret is None:
+        st.error("Не найдены credentials в Streamlit Secrets.")
+        st.info(
+            "Добавьте JSON service account в Secrets (секция [google]/[gcp_service_account]/[SVODMP] "
+            "или ключ credentials_json / credentials)."
+        )
+        return None
+
+    if isinstance(secret, str):
+        payload = _parse_credentials_json(secret)
+        if payload is None:
+            return None
+        content = secret.encode("utf-8")
+    else:
+        payload = secret
+        # превращаем секцию в обычный JSON
+        content = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    return str(_materialize_credentials(content)), payload
+
+
+def _materialize_credentials(content: bytes) -> Path:
+    """Сохраняет credentials в приватный временный каталог процесса.
+
+    Файл перезаписывается при каждом запуске: уже лежащему там файлу не доверяем.
+    """
+    temp_dir = _process_temp_dir()
+    credentials_file = temp_dir / "credentials.json"
+    # mkstemp создаёт файл с правами 0600; os.replace не даёт прочитать недописанный файл
+    fd, temp_name = tempfile.mkstemp(dir=temp_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as handle:
+        handle.write(content)
+    os.replace(temp_name, credentials_file)
+    return credentials_file
+
+
+def _validate_credentials_json(payload: dict) -> bool:
+    """Проверяет, что credentials содержат корректный private_key."""
+    private_key = payload.get("private_key")
+    if not isinstance(private_key, str):
+        st.error("В credentials нет поля private_key или оно некорректного типа.")
+        return False
+    if "BEGIN PRIVATE KEY" not in private_key or "END PRIVATE KEY" not in private_key:
+        st.error(
+            "В credentials отсутствует корректный private_key в формате PEM. "
+            "Проверьте, что ключ из service account не обрезан."
+        )
         return False
     return True
 
 
-def main() -> None:
-    setup_logging()
-    setup_streamlit_logger()
+@dataclasses.dataclass
+class _ImportJob:
+    """Фоновый импорт: поток обработки и очередь событий прогресса."""
+
+    thread: threading.Thread
+    progress: queue.Queue
+    last_progress: tuple[int, int, str] | None = None
+    failed: bool = False
+
+
+def _run_import(
+    progress: queue.Queue,
+    log_handler: StreamlitLogHandler,
+    log_store: LogStore,
+    **kwargs,
+) -> None:
+    with log_handler.bind_current_thread(log_store):
+        try:
+            # processor тянет за собой Google API клиент и Excel-ридеры; импортируем его
+            # только при реальном запуске, а не при каждом рендере страницы. Ошибка
+            # импорта уходит в журнал так же, как ошибка обработки.
+            from processor import process_directory
+
+            process_directory(**kwargs, progress_callback=lambda *args: progress.put(args))
+        except Exception:  # noqa: BLE001 - ошибка показывается в UI, поток не должен падать молча.
+            logging.getLogger(__name__).exception("Импорт завершился с ошибкой")
+            progress.put(None)
+        finally:
+            # Загруженные файлы нужны только этому импорту.
+            shutil.rmtree(kwargs["input_dir"], ignore_errors=True)
+
+
+def _start_import(**kwargs) -> _ImportJob:
+    """Запускает process_directory в фоновом потоке, чтобы не блокировать UI."""
+    progress: queue.Queue = queue.Queue()
+    thread = threading.Thread(
+        target=_run_import,
+        args=(progress, _get_log_handler(), st.session_state["log_store"]),
+        kwargs=kwargs,
+        daemon=True,
+    )
+    thread.start()
+    job = _ImportJob(thread=thread, progress=progress)
+    st.session_state["import_job"] = job
+    return job
+
+
+def _render_import_job(job: _ImportJob, running: bool) -> None:
+    """Показывает прогресс фонового импорта по накопленным событиям."""
+    while True:
+        try:
+            event = job.progress.get_nowait()
+        except queue.Empty:
+            break
+        # None в очереди — признак того, что поток упал с ошибкой
+        if event is None:
+            job.failed = True
+        else:
+            job.last_progress = event
+
+    if running:
+        if job.last_progress:
+            current, total, filename = job.last_progress
+            st.progress(int((current / total) * 100) if total else 100)
+            st.info(f"Обрабатывается файл {current}/{total}: {filename}")
+        else:
+            st.progress(0)
+            st.info("Запуск обработки. Логи смотрите ниже, в журнале выполнения.")
+        return
 
-    st.title("Импорт данных из Excel в Google Sheets")
+    st.session_state.pop("import_job", None)
+    if job.failed:
+        st.error("Импорт прерван из-за ошибки. Подробности в журнале выполнения.")
+        return
+    st.progress(100)
+    st.success("Обработка завершена.")
+    st.success("Готово")
 
-    st.markdown(
-        """
-**Описание**
-- Выберите Excel файлы (.xls/.xlsx)
-- Укажите период, если его нет в названии файла (можно отключить)
-"""
-    )
 
+@st.fragment
+def _render_import_form(import_running: bool) -> None:
+    """Виджеты импорта; их изменение перезапускает только этот фрагмент, а не весь скрипт."""
     uploaded_files = st.file_uploader(
         "Excel файлы",
         type=["xls", "xlsx"],
@@ -196,57 +429,69 @@ def main() -> None:
     if use_manual_period:
         period_value = _render_period_picker()
 
-    config = load_config("./config.json")
-    spreadsheet_id = config.get("spreadsheet_id")
-    dry_run = False
-
     if uploaded_files:
-        st.markdown("**Загруженные файлы:**")
-        st.write([uploaded_file.name for uploaded_file in uploaded_files])
+        st.markdown(
+            "**Загруженные файлы:**\n"
+            + "\n".join(f"- `{uploaded_file.name}`" for uploaded_file in uploaded_files)
+        )
 
-    if st.button("Запустить импорт"):
-        st.session_state["log_lines"].clear()
+    if not st.button("Запустить импорт", disabled=import_running):
+        return
 
-        if not uploaded_files:
-            st.error("Выберите файлы Excel")
-            return
-        if not spreadsheet_id:
-            st.error("Не найден Spreadsheet ID в config.json")
-            return
+    st.session_state["log_store"].clear()
+
+    if not uploaded_files:
+        st.error("Выберите файлы Excel")
+        return
+
+    config = _get_app_config("./config.json")
+    spreadsheet_id = extract_spreadsheet_id(config.get("spreadsheet_id"))
+    dry_run = False
+    if not spreadsheet_id:
+        st.error("Не найден Spreadsheet ID в config.json")
+        return
+
+    resolved_credentials = _resolve_credentials_path()
+    if not resolved_credentials:
+        return
+    credentials_to_use, credentials_payload = resolved_credentials
+    if not _validate_credentials_json(credentials_payload):
+        return
 
-        st.info("Запуск обработки. Логи смотрите ниже, в журнале выполнения.")
-        progress_bar = st.progress(0)
-        progress_text = st.empty()
-        upload_dir = Path("./uploads")
+    upload_dir = _new_upload_dir()
+    try:
         _save_uploaded_files(uploaded_files, upload_dir)
+    except BaseException:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        raise
+
+    _start_import(
+        input_dir=str(upload_dir),
+        period=period_value,
+        spreadsheet_id=spreadsheet_id,
+        credentials=credentials_to_use,
+        dry_run=dry_run,
+    )
+    # Полный перезапуск, чтобы прогресс и журнал вне фрагмента начали обновляться
+    st.rerun()
 
-        credentials_to_use = _resolve_credentials_path(upload_dir)
-        if not credentials_to_use:
-            return
-        if not _validate_credentials_json(credentials_to_use):
-            return
 
-        def _update_progress(current: int, total: int, filename: str) -> None:
-            progress = int((current / total) * 100) if total else 100
-            progress_bar.progress(progress)
-            progress_text.info(f"Обрабатывается файл {current}/{total}: {filename}")
-
-        process_directory(
-            input_dir=str(upload_dir),
-            period=period_value,
-            spreadsheet_id=spreadsheet_id,
-            credentials=credentials_to_use,
-            dry_run=dry_run,
-            progress_callback=_update_progress,
-        )
+def main() -> None:
+    setup_streamlit_logger()
+
+    st.markdown(_HEADER_MD)
 
-        progress_bar.progress(100)
-        progress_text.success("Обработка завершена.")
+    job: _ImportJob | None = st.session_state.get("import_job")
+    # Снимок состояния на начало прогона: кнопка и прогресс согласованы между собой
+    import_running = job is not None and job.thread.is_alive()
 
-        st.success("Готово")
+    _render_import_form(import_running)
+
+    if job is not None:
+        _render_import_job(job, import_running)
 
     st.subheader("Логи")
-    log_text = "\n".join(st.session_state.get("log_lines", []))
+    log_text = st.session_state["log_store"].text
     st.text_area(
         "Журнал выполнения",
         value=log_text,
@@ -256,6 +501,10 @@ def main() -> None:
         _copy_to_clipboard(log_text)
         st.success("Логи скопированы в буфер обмена")
 
+    if import_running:
+        time.sleep(_IMPORT_POLL_INTERVAL_S)
+        st.rerun()
+
 
 if __name__ == "__main__":
     main()
@@ -2,30 +2,33 @@ from __future__ import annotations
 
 import json
 import logging
+import re
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+SPREADSHEET_URL_REGEX = re.compile(r"/spreadsheets/d/([^/?#]+)")
+
 
 def load_config(config_path: str) -> dict:
-    path = Path(config_path)
-    if not path.exists():
+    try:
+        raw_content = Path(config_path).read_bytes()
+    except FileNotFoundError:
         logger.warning("Конфиг не найден: %s", config_path)
         return {}
 
-    with path.open("r", encoding="utf-8") as handle:
-        return json.load(handle)
+    return json.loads(raw_content)
 
 
 def extract_spreadsheet_id(value: str | None) -> str | None:
     if not value:
         return None
 
-    if "/spreadsheets/d/" in value:
-        part = value.split("/spreadsheets/d/")[-1]
-        return part.split("/")[0]
+    match = SPREADSHEET_URL_REGEX.search(value)
+    if match:
+        return match.group(1)
 
     if "/edit" in value:
-        return value.split("/edit")[0]
+        return value.split("/edit", 1)[0]
 
     return value
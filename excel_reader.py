@@ -1,16 +1,13 @@
 from __future__ import annotations
 
 import dataclasses
-import datetime
 import logging
-import math
-import re
+import zipfile
 from pathlib import Path
-from typing import Any, Iterable, Optional
+from typing import Any, Iterable, Optional, Sequence
+from xml.etree import ElementTree
 
-import openpyxl
-import pandas as pd
-import xlrd
+import python_calamine
 
 logger = logging.getLogger(__name__)
 
@@ -35,79 +32,122 @@ KEYWORD_ALIASES = {
     "goods": ["штуки"],
 }
 HEADER_ROWS = [2, 3, 4, 5]
+DATE_COL = 0
+DAY_COL = 1
+# Нормализованные (в нижнем регистре) написания заголовков, считаются один раз при импорте.
+_HEADER_VALUES = {
+    key: frozenset([keyword.lower(), *(alias.lower() for alias in KEYWORD_ALIASES.get(key, []))])
+    for key, keyword in KEYWORDS.items()
+}
+# Обратная таблица «написание -> ключ»: совпадение ячейки ищется одним обращением к dict.
+_HEADER_KEY_BY_TEXT = {text: key for key, texts in _HEADER_VALUES.items() for text in texts}
+# Порядок важен: магазин определяется по первому найденному в имени файла псевдониму.
+_STORE_NAME_ALIASES = (
+    ("ахтубинск", "Ахтубинск"),
+    ("европа", "Европа"),
+    ("санвэй", "Козловская"),
+    ("санвей", "Козловская"),
+)
+# Колонки по умолчанию для магазинов, в файлах которых нет части заголовков.
+_STORE_FALLBACK_COLUMNS = {
+    ("Ахтубинск", "checks"): 16,
+    ("Ахтубинск", "goods"): 19,
+    ("Ахтубинск", "gift_cert"): 38,
+    ("Европа", "checks"): 16,
+    ("Европа", "goods"): 19,
+    ("Козловская", "checks"): 19,
+    ("Козловская", "goods"): 22,
+}
 
 
 class ExcelReadError(Exception):
     pass
 
 
-class _DataFrameSheet:
-    """Обертка над DataFrame для совместимости с xlrd-интерфейсом."""
+class _XlsSheet:
+    """Значения листа .xls в памяти (индексы с 0); объединения — полуоткрытые (rlo, rhi, clo, chi)."""
 
-    def __init__(self, rows: list[list[Any]]) -> None:
+    def __init__(
+        self,
+        rows: list[list[Any]],
+        merged_cells: list[tuple[int, int, int, int]] | None = None,
+    ) -> None:
         self._rows = rows
         self.nrows = len(rows)
-        self.ncols = max((len(row) for row in rows), default=0)
-        self.merged_cells: list[tuple[int, int, int, int]] = []
+        self.merged_cells = merged_cells or []
+        self._merged_by_row: dict[int, list[tuple[int, int, int, int]]] = {}
+        for merged in self.merged_cells:
+            rlo, rhi, _clo, _chi = merged
+            for row in range(rlo, rhi):
+                self._merged_by_row.setdefault(row, []).append(merged)
+
+    def merged_cells_in_row(self, row: int) -> list[tuple[int, int, int, int]]:
+        """Объединённые диапазоны, покрывающие строку (индекс строится один раз на лист)."""
+        return self._merged_by_row.get(row, [])
+
+    @property
+    def rows(self) -> list[list[Any]]:
+        return self._rows
 
     def cell_value(self, row: int, col: int) -> Any:
         try:
-            value = self._rows[row][col]
+            return self._rows[row][col]
         except IndexError:
             return None
-        if isinstance(value, float) and math.isnan(value):
-            return None
-        return value
-
 
-def read_excel_smart(path: Path) -> pd.DataFrame:
-    """Читает Excel с явным движком для .xls."""
-    if path.suffix.lower() == ".xls":
-        return pd.read_excel(path, engine="xlrd")
-    return pd.read_excel(path)
 
+class _XlsxSheet:
+    """Значения листа .xlsx в памяти; строки и колонки нумеруются с 1, как в Excel."""
 
-def _convert_xls_to_xlsx(file_path: Path) -> Path:
-    """Конвертирует xls в xlsx для повторной попытки чтения."""
-    workbook = xlrd.open_workbook(file_path)
-    sheet = workbook.sheet_by_index(0)
-    target_path = file_path.with_name(f"{file_path.stem}_copy.xlsx")
-    output = openpyxl.Workbook()
-    out_sheet = output.active
-    out_sheet.title = sheet.name
-    for row in range(sheet.nrows):
-        for col in range(sheet.ncols):
-            out_sheet.cell(row=row + 1, column=col + 1, value=sheet.cell_value(row, col))
-    output.save(target_path)
-    return target_path
+    def __init__(
+        self,
+        rows: list[list[Any]] | list[tuple[Any, ...]],
+        merged_cells: list[tuple[int, int, int, int]],
+    ) -> None:
+        self._rows = rows
+        self.max_row = len(rows)
+        # Диапазоны в виде (min_row, min_col, max_row, max_col).
+        self.merged_cells = merged_cells
+        self._merged_by_row: dict[int, list[tuple[int, int, int, int]]] = {}
+        for merged in merged_cells:
+            min_row, _min_col, max_row, _max_col = merged
+            for row in range(min_row, max_row + 1):
+                self._merged_by_row.setdefault(row, []).append(merged)
+
+    def merged_cells_in_row(self, row: int) -> list[tuple[int, int, int, int]]:
+        """Объединённые диапазоны, покрывающие строку (индекс строится один раз на лист)."""
+        return self._merged_by_row.get(row, [])
+
+    @property
+    def rows(self) -> list[list[Any]] | list[tuple[Any, ...]]:
+        return self._rows
+
+    def value(self, row: int, col: int) -> Any:
+        try:
+            return self._rows[row - 1][col - 1]
+        except IndexError:
+            return None
 
 
 def read_excel(file_path: Path) -> ExcelData:
     if file_path.suffix.lower() == ".xlsx":
         return _read_xlsx(file_path)
     if file_path.suffix.lower() == ".xls":
-        try:
-            return _read_xls(file_path)
-        except ExcelReadError as exc:
-            if "Не найдена строка" in str(exc):
-                converted = _convert_xls_to_xlsx(file_path)
-                logger.info("Файл %s конвертирован в %s", file_path.name, converted)
-                return _read_xlsx(converted)
-            raise
+        return _read_xls(file_path)
     raise ExcelReadError(f"Неподдерживаемое расширение: {file_path.suffix}")
 
 
 def _read_xlsx(file_path: Path) -> ExcelData:
-    workbook = openpyxl.load_workbook(file_path, data_only=True)
-    sheet = _select_sheet_for_parsing_xlsx(workbook)
+    sheet, checks_header_cell = _load_primary_xlsx_sheet(file_path)
 
     store = _detect_store_from_path(file_path)
-    data_start_row, date_col, day_col = _find_data_start_row_xlsx(sheet)
-    try:
-        checks_header_row, _checks_header_col = _find_checks_header_cell_xlsx(sheet)
-        data_start_row = checks_header_row + 5
-    except ExcelReadError:
+    date_col, day_col = DATE_COL, DAY_COL
+    if checks_header_cell is not None:
+        data_start_row = checks_header_cell[0] + 5
+    else:
+        # Строка «Дата» нужна только как запасной вариант, без «Чеки» её и ищем.
         logger.warning("Не найдена ячейка «Чеки» в заголовке, используем строку «Дата»")
+        data_start_row, date_col, day_col = _find_data_start_row_xlsx(sheet)
     if store == "Ахтубинск":
         data_start_row = 7
     header_rows = _build_header_rows(data_start_row)
@@ -129,15 +169,15 @@ def _read_xlsx(file_path: Path) -> ExcelData:
 
 
 def _read_xls(file_path: Path) -> ExcelData:
-    sheet = _load_primary_xls_sheet(file_path)
+    sheet, checks_header_cell = _load_primary_xls_sheet(file_path)
 
     store = _detect_store_from_path(file_path)
-    data_start_row, date_col, day_col = _find_data_start_row_xls(sheet)
-    try:
-        checks_header_row, _checks_header_col = _find_checks_header_cell_xls(sheet)
-        data_start_row = checks_header_row + 6
-    except ExcelReadError:
+    date_col, day_col = DATE_COL, DAY_COL
+    if checks_header_cell is not None:
+        data_start_row = checks_header_cell[0] + 6
+    else:
         logger.warning("Не найдена ячейка «Чеки» в заголовке, используем строку «Дата»")
+        data_start_row, date_col, day_col = _find_data_start_row_xls(sheet)
     if store == "Ахтубинск":
         data_start_row = 7
     header_rows = _build_header_rows(data_start_row)
@@ -164,268 +204,276 @@ def _read_xls(file_path: Path) -> ExcelData:
 
 
 def _find_keyword_columns_xlsx(
-    sheet: openpyxl.worksheet.worksheet.Worksheet,
+    sheet: _XlsxSheet,
     header_rows: list[int],
     store: str | None = None,
 ) -> dict[str, int]:
+    found = _find_header_columns_xlsx(sheet)
     column_map: dict[str, int] = {}
-    try:
-        column_map["checks"] = _find_header_column_xlsx(sheet, "checks")
-    except ExcelReadError:
-        column_map["checks"] = _get_store_fallback_column(store, "checks")
-
-    try:
-        column_map["goods"] = _find_header_column_xlsx(sheet, "goods")
-    except ExcelReadError:
-        column_map["goods"] = _get_store_fallback_column(store, "goods")
-
-    try:
-        column_map["gift_cert"] = _find_header_column_xlsx(sheet, "gift_cert")
-    except ExcelReadError:
-        column_map["gift_cert"] = _get_store_fallback_column(store, "gift_cert")
+    for key in KEYWORDS:
+        if key in found:
+            column_map[key] = found[key]
+        else:
+            column_map[key] = _get_store_fallback_column(store, key)
 
     _validate_column_map(column_map, header_rows)
     return column_map
 
 
-def _get_merge_left_col_xlsx(
-    sheet: openpyxl.worksheet.worksheet.Worksheet, row: int, col: int
-) -> int:
-    for cell_range in sheet.merged_cells.ranges:
-        if cell_range.min_row <= row <= cell_range.max_row and cell_range.min_col <= col <= cell_range.max_col:
-            return cell_range.min_col
-    return col
-
-
 def _find_keyword_columns_xls(
-    sheet: xlrd.sheet.Sheet,
+    sheet: _XlsSheet,
     header_rows: list[int],
     data_start_row: int,
     store: str | None = None,
 ) -> dict[str, int]:
+    found = _find_header_columns_xls(sheet)
     column_map: dict[str, int] = {}
-    try:
-        column_map["checks"] = _find_header_column_xls(sheet, "checks")
-    except ExcelReadError:
-        column_map["checks"] = _get_store_fallback_column(store, "checks")
-
-    try:
-        column_map["goods"] = _find_header_column_xls(sheet, "goods")
-    except ExcelReadError:
-        column_map["goods"] = _get_store_fallback_column(store, "goods")
-
-    try:
-        column_map["gift_cert"] = _find_header_column_xls(sheet, "gift_cert")
-    except ExcelReadError:
-        column_map["gift_cert"] = _get_store_fallback_column(store, "gift_cert")
+    for key in KEYWORDS:
+        if key in found:
+            column_map[key] = found[key]
+        else:
+            column_map[key] = _get_store_fallback_column(store, key)
 
     _validate_column_map(column_map, header_rows)
     return column_map
 
 
-def _get_merge_left_col_xls(sheet: xlrd.sheet.Sheet, row: int, col: int) -> int:
-    for rlo, rhi, clo, chi in sheet.merged_cells:
-        if rlo <= row < rhi and clo <= col < chi:
-            return clo
-    return col
-
-
-def _find_header_column_xlsx(
-    sheet: openpyxl.worksheet.worksheet.Worksheet,
-    key: str,
-) -> int:
-    """Возвращает индекс колонки заголовка в 3-й строке (xlsx)."""
+def _find_header_columns_xlsx(sheet: _XlsxSheet) -> dict[str, int]:
+    """Возвращает индексы колонок заголовков в 3-й строке (xlsx) за один проход."""
     header_row = 3
-    merged_col = _find_header_column_in_merged_xlsx(sheet, key, header_row)
-    if merged_col is not None:
-        return merged_col - 1
-    max_col = sheet.max_column
-    for col in range(1, max_col + 1):
-        value = sheet.cell(row=header_row, column=col).value
-        if _is_header_value(value, key):
-            return col - 1
-    raise ExcelReadError(f"Не найдена колонка «{KEYWORDS[key]}» в заголовке файла.")
-
-
-def _find_header_column_xls(sheet: xlrd.sheet.Sheet, key: str) -> int:
-    """Возвращает индекс колонки заголовка в 3-й строке (xls)."""
+    found = _find_header_columns_in_merged_xlsx(sheet, header_row)
+    remaining = [key for key in KEYWORDS if key not in found]
+    values = sheet.rows[header_row - 1] if header_row <= sheet.max_row else ()
+    for col, value in enumerate(values):
+        if not remaining:
+            break
+        key = _header_key(value, remaining)
+        if key is not None:
+            found[key] = col
+            remaining.remove(key)
+    return found
+
+
+def _find_header_columns_xls(sheet: _XlsSheet) -> dict[str, int]:
+    """Возвращает индексы колонок заголовков в 3-й строке (xls) за один проход."""
     header_row = 2
-    merged_col = _find_header_column_in_merged_xls(sheet, key, header_row)
-    if merged_col is not None:
-        return merged_col
-    for col in range(sheet.ncols):
-        value = sheet.cell_value(header_row, col)
-        if _is_header_value(value, key):
-            return col
-    raise ExcelReadError(f"Не найдена колонка «{KEYWORDS[key]}» в заголовке файла.")
-
-
-def _find_header_column_in_merged_xlsx(
-    sheet: openpyxl.worksheet.worksheet.Worksheet,
-    key: str,
-    header_row: int,
-) -> Optional[int]:
-    for cell_range in sheet.merged_cells.ranges:
-        if cell_range.min_row != header_row:
+    found = _find_header_columns_in_merged_xls(sheet, header_row)
+    remaining = [key for key in KEYWORDS if key not in found]
+    values = sheet.rows[header_row] if header_row < sheet.nrows else ()
+    for col, value in enumerate(values):
+        if not remaining:
+            break
+        key = _header_key(value, remaining)
+        if key is not None:
+            found[key] = col
+            remaining.remove(key)
+    return found
+
+
+def _find_header_columns_in_merged_xlsx(sheet: _XlsxSheet, header_row: int) -> dict[str, int]:
+    """Объединённые ячейки строки заголовка имеют приоритет над обычными."""
+    found: dict[str, int] = {}
+    remaining = list(KEYWORDS)
+    for min_row, min_col, _max_row, _max_col in sheet.merged_cells_in_row(header_row):
+        if min_row != header_row:
             continue
-        value = sheet.cell(row=cell_range.min_row, column=cell_range.min_col).value
-        if _is_header_value(value, key):
-            return cell_range.min_col
-    return None
-
-
-def _find_header_column_in_merged_xls(
-    sheet: xlrd.sheet.Sheet,
-    key: str,
-    header_row: int,
-) -> Optional[int]:
-    for rlo, _rhi, clo, _chi in sheet.merged_cells:
+        key = _header_key(sheet.value(min_row, min_col), remaining)
+        if key is not None:
+            found[key] = min_col - 1
+            remaining.remove(key)
+    return found
+
+
+def _find_header_columns_in_merged_xls(sheet: _XlsSheet, header_row: int) -> dict[str, int]:
+    """Объединённые ячейки строки заголовка имеют приоритет над обычными."""
+    found: dict[str, int] = {}
+    remaining = list(KEYWORDS)
+    for rlo, _rhi, clo, _chi in sheet.merged_cells_in_row(header_row):
         if rlo != header_row:
             continue
-        value = sheet.cell_value(rlo, clo)
-        if _is_header_value(value, key):
-            return clo
-    return None
+        key = _header_key(sheet.cell_value(rlo, clo), remaining)
+        if key is not None:
+            found[key] = clo
+            remaining.remove(key)
+    return found
+
+
+def _header_key(value: Any, keys: Iterable[str]) -> Optional[str]:
+    """Ключ заголовка, которому соответствует ячейка; текст нормализуется один раз на ячейку."""
+    if not isinstance(value, str):
+        return None
+    key = _HEADER_KEY_BY_TEXT.get(_normalize_header_value(value))
+    return key if key is not None and key in keys else None
 
 
 def _is_header_value(value: Any, key: str) -> bool:
-    text = _normalize_header_value(value)
-    if text is None:
+    # Числа и даты заголовком быть не могут, нормализовать их незачем.
+    if not isinstance(value, str):
         return False
-    if text == KEYWORDS[key].lower():
-        return True
-    aliases = KEYWORD_ALIASES.get(key, [])
-    return any(text == alias.lower() for alias in aliases)
+    return _normalize_header_value(value) in _HEADER_VALUES[key]
+
+
+def _find_header_in_row(values: Sequence[Any], key: str) -> Optional[int]:
+    """Индекс первой ячейки строки с заголовком key; нормализуются только строки."""
+    targets = _HEADER_VALUES[key]
+    for col, value in enumerate(values):
+        if isinstance(value, str) and _normalize_header_value(value) in targets:
+            return col
+    return None
 
 
 def _find_checks_header_cell_xlsx(
-    sheet: openpyxl.worksheet.worksheet.Worksheet,
+    sheet: _XlsxSheet,
 ) -> tuple[int, int]:
-    """Возвращает координаты ячейки с заголовком «Чеки» (xlsx)."""
-    for cell_range in sheet.merged_cells.ranges:
-        value = sheet.cell(row=cell_range.min_row, column=cell_range.min_col).value
+    """Возвращает координаты ячейки с заголовком «Чеки» (xlsx).
+
+    Просматривается весь лист, поиск останавливается на первом совпадении.
+    """
+    for min_row, min_col, _max_row, _max_col in sheet.merged_cells:
+        value = sheet.value(min_row, min_col)
         if _is_header_value(value, "checks"):
-            return cell_range.min_row, cell_range.min_col
-    for row in range(1, sheet.max_row + 1):
-        for col in range(1, sheet.max_column + 1):
-            value = sheet.cell(row=row, column=col).value
-            if _is_header_value(value, "checks"):
-                return row, col
+            return min_row, min_col
+    for row, values in enumerate(sheet.rows, start=1):
+        col = _find_header_in_row(values, "checks")
+        if col is not None:
+            return row, col + 1
     raise ExcelReadError("Не найдена колонка «Чеки» в заголовке файла.")
 
 
-def _find_checks_header_cell_xls(sheet: xlrd.sheet.Sheet) -> tuple[int, int]:
-    """Возвращает координаты ячейки с заголовком «Чеки» (xls)."""
+def _find_checks_header_cell_xls(sheet: _XlsSheet) -> tuple[int, int]:
+    """Возвращает координаты ячейки с заголовком «Чеки» (xls), просматривая весь лист."""
     for rlo, _rhi, clo, _chi in sheet.merged_cells:
         value = sheet.cell_value(rlo, clo)
         if _is_header_value(value, "checks"):
             return rlo, clo
-    for row in range(sheet.nrows):
-        for col in range(sheet.ncols):
-            value = sheet.cell_value(row, col)
-            if _is_header_value(value, "checks"):
-                return row, col
+    for row, values in enumerate(sheet.rows):
+        col = _find_header_in_row(values, "checks")
+        if col is not None:
+            return row, col
     raise ExcelReadError("Не найдена колонка «Чеки» в заголовке файла.")
 
 
-def _read_xls_merged_cells(file_path: Path) -> list[tuple[int, int, int, int]]:
-    """Считывает диапазоны объединённых ячеек из .xls."""
-    try:
-        workbook = xlrd.open_workbook(file_path, formatting_info=True)
-        sheet = workbook.sheet_by_index(0)
-        return list(sheet.merged_cells)
-    except Exception as exc:  # noqa: BLE001 - резервный путь, если формат не поддержан.
-        logger.warning("Не удалось считать объединённые ячейки из %s: %s", file_path.name, exc)
-        return []
+def _load_primary_xlsx_sheet(file_path: Path) -> tuple[_XlsxSheet, tuple[int, int] | None]:
+    """Загружает .xlsx лист, подбирая подходящий по наличию заголовков, иначе берёт активный.
 
+    Вместе с листом возвращает найденную ячейку «Чеки» (или None), чтобы не искать её повторно.
+    """
+    workbook = python_calamine.CalamineWorkbook.from_path(file_path)
+    sheets: dict[int, _XlsxSheet] = {}
+    try:
+        for idx, metadata in enumerate(workbook.sheets_metadata):
+            if metadata.typ != python_calamine.SheetTypeEnum.WorkSheet:
+                continue
+            sheet = _load_calamine_matrix(workbook.get_sheet_by_index(idx))
+            try:
+                return sheet, _find_checks_header_cell_xlsx(sheet)
+            except ExcelReadError:
+                sheets[idx] = sheet
+    finally:
+        workbook.close()
+    if not sheets:
+        raise ExcelReadError(f"В файле {file_path.name} нет листов с данными.")
+    # Активный лист нужен только здесь, поэтому workbook.xml читается лишь без «Чеки».
+    fallback = sheets.get(_xlsx_active_sheet_index(file_path))
+    return (fallback if fallback is not None else next(iter(sheets.values()))), None
+
+
+def _xlsx_active_sheet_index(file_path: Path) -> int:
+    """Индекс активного листа из <workbookView activeTab> в xl/workbook.xml (calamine его не сообщает).
+
+    Если прочитать его не удалось, считается активным первый лист.
+    """
+    try:
+        with zipfile.ZipFile(file_path) as archive, archive.open("xl/workbook.xml") as source:
+            for _event, element in ElementTree.iterparse(source):
+                if _local_name(element.tag) == "workbookView":
+                    active_tab = element.get("activeTab", "0")
+                    return int(active_tab) if active_tab.isdigit() else 0
+    except (OSError, KeyError, zipfile.BadZipFile, ElementTree.ParseError) as exc:
+        logger.warning("Не удалось определить активный лист %s: %s", file_path.name, exc)
+    return 0
+
+
+def _local_name(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+def _load_calamine_matrix(worksheet: python_calamine.CalamineSheet) -> _XlsxSheet:
+    """Переводит лист calamine в матрицу; диапазоны объединений приводятся к нумерации с 1."""
+    rows = worksheet.to_python(skip_empty_area=False)
+    merged = [
+        (min_row + 1, min_col + 1, max_row + 1, max_col + 1)
+        for (min_row, min_col), (max_row, max_col) in worksheet.merged_cell_ranges or ()
+    ]
+    return _XlsxSheet(rows, merged)
 
-def _select_sheet_for_parsing_xlsx(
-    workbook: openpyxl.Workbook,
-) -> openpyxl.worksheet.worksheet.Worksheet:
-    """Пытается найти лист с заголовками, иначе возвращает активный."""
-    for sheet in workbook.worksheets:
-        try:
-            _find_checks_header_cell_xlsx(sheet)
-            return sheet
-        except ExcelReadError:
-            continue
-    return workbook.active
 
+def _load_primary_xls_sheet(file_path: Path) -> tuple[_XlsSheet, tuple[int, int] | None]:
+    """Загружает .xls лист, подбирая подходящий по наличию заголовков, иначе первый непустой.
 
-def _load_primary_xls_sheet(file_path: Path) -> _DataFrameSheet:
-    """Загружает .xls лист, подбирая подходящий по наличию заголовков."""
-    workbook = xlrd.open_workbook(file_path, formatting_info=True)
-    selected_rows: list[list[Any]] = []
-    selected_merged: list[tuple[int, int, int, int]] = []
-    for idx in range(workbook.nsheets):
-        sheet = workbook.sheet_by_index(idx)
-        rows = [
-            [
-                sheet.cell_value(row, col)
-                for col in range(sheet.ncols)
-            ]
-            for row in range(sheet.nrows)
-        ]
-        wrapper = _DataFrameSheet(rows)
-        wrapper.merged_cells = list(sheet.merged_cells)
-        try:
-            _find_checks_header_cell_xls(wrapper)
-            return wrapper
-        except ExcelReadError:
-            if not selected_rows:
-                selected_rows = rows
-                selected_merged = list(sheet.merged_cells)
-    wrapper = _DataFrameSheet(selected_rows)
-    wrapper.merged_cells = selected_merged
-    return wrapper
+    Вместе с листом возвращает найденную ячейку «Чеки» (или None), чтобы не искать её повторно.
+    """
+    workbook = python_calamine.CalamineWorkbook.from_path(file_path)
+    fallback: _XlsSheet | None = None
+    try:
+        for idx, metadata in enumerate(workbook.sheets_metadata):
+            if metadata.typ != python_calamine.SheetTypeEnum.WorkSheet:
+                continue
+            sheet = _load_calamine_xls_matrix(workbook.get_sheet_by_index(idx))
+            try:
+                return sheet, _find_checks_header_cell_xls(sheet)
+            except ExcelReadError:
+                if fallback is None and sheet.nrows:
+                    fallback = sheet
+    finally:
+        workbook.close()
+    return (fallback if fallback is not None else _XlsSheet([])), None
+
+
+def _load_calamine_xls_matrix(worksheet: python_calamine.CalamineSheet) -> _XlsSheet:
+    """Переводит лист calamine в матрицу; объединения приводятся к полуоткрытым диапазонам."""
+    rows = worksheet.to_python(skip_empty_area=False)
+    merged = [
+        (min_row, max_row + 1, min_col, max_col + 1)
+        for (min_row, min_col), (max_row, max_col) in worksheet.merged_cell_ranges or ()
+    ]
+    return _XlsSheet(rows, merged)
 
 
 def _find_data_start_row_xlsx(
-    sheet: openpyxl.worksheet.worksheet.Worksheet,
+    sheet: _XlsxSheet,
 ) -> tuple[int, int, int]:
-    for row in range(1, sheet.max_row + 1):
-        value = sheet.cell(row=row, column=1).value
-        if _is_date_header(value):
-            return row + 1, 0, 1
-    return 2, 0, 1
+    for row, values in enumerate(sheet.rows, start=1):
+        if values and _is_date_header(values[0]):
+            return row + 1, DATE_COL, DAY_COL
+    return 2, DATE_COL, DAY_COL
 
 
-def _find_data_start_row_xls(sheet: xlrd.sheet.Sheet) -> tuple[int, int, int]:
-    for row in range(sheet.nrows):
-        value = _get_header_text_xls(sheet, row, 0)
-        if _is_date_header(value):
-            return row + 2, 0, 1
-    return 2, 0, 1
+def _find_data_start_row_xls(sheet: _XlsSheet) -> tuple[int, int, int]:
+    # Объединения не проверяются: верхняя ячейка диапазона в колонке A
+    # просматривается раньше покрытых ею строк.
+    for row, values in enumerate(sheet.rows):
+        if values and _is_date_header(values[0]):
+            return row + 2, DATE_COL, DAY_COL
+    return 2, DATE_COL, DAY_COL
 
 
 def _detect_store_from_path(file_path: Path) -> str | None:
     lower_name = file_path.stem.lower()
-    if "ахтубинск" in lower_name:
-        return "Ахтубинск"
-    if "европа" in lower_name:
-        return "Европа"
-    if "санвэй" in lower_name or "санвей" in lower_name:
-        return "Козловская"
+    for alias, store in _STORE_NAME_ALIASES:
+        if alias in lower_name:
+            return store
     return None
 
 
 def _get_store_fallback_column(store: str | None, keyword: str) -> int:
-    if store in {"Ахтубинск", "Европа"} and keyword == "checks":
-        return 16
-    if store == "Ахтубинск" and keyword == "goods":
-        return 19
-    if store == "Ахтубинск" and keyword == "gift_cert":
-        return 38
-    if store == "Европа" and keyword == "goods":
-        return 19
-    if store == "Козловская" and keyword == "checks":
-        return 19
-    if store == "Козловская" and keyword == "goods":
-        return 22
-    raise ExcelReadError(f"Не найдена колонка «{KEYWORDS[keyword]}» в заголовке файла.")
-
-
-def _find_data_end_row_xlsx(sheet: openpyxl.worksheet.worksheet.Worksheet, start_row: int) -> int:
+    try:
+        return _STORE_FALLBACK_COLUMNS[(store, keyword)]
+    except KeyError:
+        raise ExcelReadError(f"Не найдена колонка «{KEYWORDS[keyword]}» в заголовке файла.") from None
+
+
+def _find_data_end_row_xlsx(sheet: _XlsxSheet, start_row: int) -> int:
     last_row = sheet.max_row
     return _trim_trailing_empty_rows(
         range(start_row, last_row + 1),
@@ -433,7 +481,7 @@ def _find_data_end_row_xlsx(sheet: openpyxl.worksheet.worksheet.Worksheet, start
     )
 
 
-def _find_data_end_row_xls(sheet: xlrd.sheet.Sheet, start_row: int) -> int:
+def _find_data_end_row_xls(sheet: _XlsSheet, start_row: int) -> int:
     last_row = sheet.nrows
     return _trim_trailing_empty_rows(
         range(start_row, last_row + 1),
@@ -441,96 +489,83 @@ def _find_data_end_row_xls(sheet: xlrd.sheet.Sheet, start_row: int) -> int:
     )
 
 
-def _trim_trailing_empty_rows(rows: Iterable[int], has_data) -> int:
-    rows = list(rows)
+def _trim_trailing_empty_rows(rows: range, has_data) -> int:
+    # range разворачивается без копирования; пустой диапазон (данные начинаются
+    # ниже последней строки листа) означает, что строк с данными нет.
     for row in reversed(rows):
         if has_data(row):
             return row
-    return rows[0] - 1
+    return rows.start - 1
 
 
-def _row_has_data_xlsx(sheet: openpyxl.worksheet.worksheet.Worksheet, row: int) -> bool:
-    for col in range(1, 9):
-        value = sheet.cell(row=row, column=col).value
-        if not _is_empty_value(value):
+def _row_has_data_xlsx(sheet: _XlsxSheet, row: int) -> bool:
+    # Срез колонок A:H из матрицы.
+    for value in sheet.rows[row - 1][:8]:
+        if value is not None and value != "":
             return True
     return False
 
 
-def _row_has_data_xls(sheet: xlrd.sheet.Sheet, row: int) -> bool:
-    for col in range(8):
-        value = sheet.cell_value(row, col)
-        if not _is_empty_value(value):
+def _row_has_data_xls(sheet: _XlsSheet, row: int) -> bool:
+    # Срез колонок A:H из матрицы.
+    for value in sheet.rows[row][:8]:
+        if value is not None and value != "":
             return True
     return False
 
 
 def _extract_rows_xlsx(
-    sheet: openpyxl.worksheet.worksheet.Worksheet,
+    sheet: _XlsxSheet,
     start_row: int,
     end_row: int,
     column_map: dict[str, int],
     date_col: int,
     day_col: int,
 ) -> list[list[Any]]:
-    rows: list[list[Any]] = []
-    for row in range(start_row, end_row + 1):
-        rows.append(_build_row_xlsx(sheet, row, column_map, date_col, day_col))
-    return rows
+    return _build_rows(sheet.rows[start_row - 1:end_row], column_map, date_col, day_col)
 
 
 def _extract_rows_xls(
-    sheet: xlrd.sheet.Sheet,
+    sheet: _XlsSheet,
     start_row: int,
     end_row: int,
     column_map: dict[str, int],
     date_col: int,
     day_col: int,
 ) -> list[list[Any]]:
-    rows: list[list[Any]] = []
-    for row in range(start_row - 1, end_row):
-        rows.append(_build_row_xls(sheet, row, column_map, date_col, day_col))
-    return rows
-
-
-def _build_row_xlsx(
-    sheet: openpyxl.worksheet.worksheet.Worksheet,
-    row: int,
-    column_map: dict[str, int],
-    date_col: int,
-    day_col: int,
-) -> list[Any]:
-    values = [
-        sheet.cell(row=row, column=date_col + 1).value,
-        sheet.cell(row=row, column=day_col + 1).value,
-        sheet.cell(row=row, column=3).value,
-        sheet.cell(row=row, column=column_map["checks"] + 1).value,
-        None,
-        sheet.cell(row=row, column=column_map["goods"] + 1).value,
-        sheet.cell(row=row, column=5).value,
-        sheet.cell(row=row, column=column_map["gift_cert"] + 1).value,
-    ]
-    return values
+    return _build_rows(sheet.rows[start_row - 1:end_row], column_map, date_col, day_col)
 
 
-def _build_row_xls(
-    sheet: xlrd.sheet.Sheet,
-    row: int,
+def _build_rows(
+    row_values: Iterable[Sequence[Any]],
     column_map: dict[str, int],
     date_col: int,
     day_col: int,
-) -> list[Any]:
-    values = [
-        sheet.cell_value(row, date_col),
-        sheet.cell_value(row, day_col),
-        sheet.cell_value(row, 2),
-        sheet.cell_value(row, column_map["checks"]),
-        None,
-        sheet.cell_value(row, column_map["goods"]),
-        sheet.cell_value(row, 4),
-        sheet.cell_value(row, column_map["gift_cert"]),
-    ]
-    return values
+) -> list[list[Any]]:
+    # Индексы колонок вычисляются один раз на чтение, а не на каждую строку.
+    checks_col = column_map["checks"]
+    goods_col = column_map["goods"]
+    gift_cert_col = column_map["gift_cert"]
+    # Короткие строки добиваются None до нужной ширины.
+    width = max(date_col, day_col, 4, checks_col, goods_col, gift_cert_col) + 1
+    padding = (None,) * width
+    rows: list[list[Any]] = []
+    for values in row_values:
+        if len(values) < width:
+            values = (*values, *padding[len(values):])
+        rows.append(
+            [
+                values[date_col],
+                values[day_col],
+                values[2],
+                values[checks_col],
+                None,
+                values[goods_col],
+                values[4],
+                values[gift_cert_col],
+            ]
+        )
+    return rows
 
 
 def _validate_column_map(column_map: dict[str, int], header_rows: list[int]) -> None:
@@ -552,149 +587,12 @@ def _build_header_rows(data_start_row: int) -> list[int]:
 def _normalize_header_value(value: Any) -> Optional[str]:
     if value is None:
         return None
-    text = str(value).replace("\u00a0", " ").strip().lower()
-    text = " ".join(text.split())
+    # split() без аргументов уже режет по любым пробелам, включая неразрывный.
+    text = " ".join(str(value).lower().split())
     return text if text else None
 
 
-def _keyword_in_text(key: str, keyword: str, text: str) -> bool:
-    if keyword.lower() in text:
-        return True
-    aliases = KEYWORD_ALIASES.get(key, [])
-    return any(alias.lower() in text for alias in aliases)
-
-
 def _is_date_header(value: Any) -> bool:
-    if value is None:
-        return False
-    text = str(value).strip().lower()
-    text = _normalize_text_for_header(text)
-    return "дата" in text
-
-
-def _is_day_header(value: Any) -> bool:
-    if value is None:
-        return False
-    text = str(value).strip().lower()
-    text = _normalize_text_for_header(text)
-    return "день нед" in text
-
-
-def _normalize_text_for_header(text: str) -> str:
-    text = text.replace("\u00a0", " ")
-    text = text.replace("\ufeff", " ")
-    text = re.sub(r"[^\w]+", " ", text, flags=re.UNICODE)
-    return " ".join(text.split())
-
-
-def _is_empty_value(value: Any) -> bool:
-    if value is None:
-        return True
-    if isinstance(value, str) and value == "":
-        return True
-    return False
-
-
-def _get_header_text_xlsx(
-    sheet: openpyxl.worksheet.worksheet.Worksheet,
-    row: int,
-    col: int,
-) -> Optional[str]:
-    value = sheet.cell(row=row, column=col).value
-    text = _normalize_header_value(value)
-    if text:
-        return text
-    for cell_range in sheet.merged_cells.ranges:
-        if cell_range.min_row <= row <= cell_range.max_row and cell_range.min_col <= col <= cell_range.max_col:
-            merged_value = sheet.cell(row=cell_range.min_row, column=cell_range.min_col).value
-            return _normalize_header_value(merged_value)
-    return None
-
-
-def _get_header_text_xls(sheet: xlrd.sheet.Sheet, row: int, col: int) -> Optional[str]:
-    value = sheet.cell_value(row, col)
-    text = _normalize_header_value(value)
-    if text:
-        return text
-    for rlo, rhi, clo, chi in sheet.merged_cells:
-        if rlo <= row < rhi and clo <= col < chi:
-            merged_value = sheet.cell_value(rlo, clo)
-            return _normalize_header_value(merged_value)
-    return None
-
-
-def _find_date_like_row_xlsx(sheet: openpyxl.worksheet.worksheet.Worksheet) -> Optional[int]:
-    max_row = sheet.max_row
-    max_col = sheet.max_column
-    for row in range(1, max_row + 1):
-        for col in range(1, max_col + 1):
-            value = sheet.cell(row=row, column=col).value
-            if _is_date_like_value(value):
-                return row + 1
-    return None
-
-
-def _find_date_like_row_xls(sheet: xlrd.sheet.Sheet) -> Optional[int]:
-    max_col = sheet.ncols
-    for row in range(sheet.nrows):
-        for col in range(max_col):
-            value = sheet.cell_value(row, col)
-            if _is_date_like_value(value):
-                return row + 2
-    return None
-
-
-def _find_date_like_in_column_xlsx(sheet: openpyxl.worksheet.worksheet.Worksheet) -> Optional[int]:
-    max_row = sheet.max_row
-    for row in range(1, max_row + 1):
-        value = sheet.cell(row=row, column=1).value
-        if _is_date_like_value(value):
-            return row
-    return None
-
-
-def _find_date_like_in_column_xls(sheet: xlrd.sheet.Sheet) -> Optional[int]:
-    for row in range(sheet.nrows):
-        value = sheet.cell_value(row, 0)
-        if _is_date_like_value(value):
-            return row + 1
-    return None
-
-
-def _is_date_like_value(value: Any) -> bool:
-    if value is None:
-        return False
-    if isinstance(value, datetime.datetime):
-        return True
-    if isinstance(value, datetime.date):
-        return True
-    text = str(value).strip()
-    if not text:
-        return False
-    for fmt in ("%d.%m.%y", "%d.%m.%Y"):
-        try:
-            datetime.datetime.strptime(text, fmt)
-            return True
-        except ValueError:
-            continue
-    return False
-
-
-def _find_day_header_xlsx(
-    sheet: openpyxl.worksheet.worksheet.Worksheet,
-) -> Optional[tuple[int, int]]:
-    for row in range(1, sheet.max_row + 1):
-        for col in range(1, min(sheet.max_column, 26) + 1):
-            value = _get_header_text_xlsx(sheet, row, col)
-            if _is_day_header(value):
-                return row, col
-    return None
-
-
-def _find_day_header_xls(sheet: xlrd.sheet.Sheet) -> Optional[tuple[int, int]]:
-    for row in range(sheet.nrows):
-        for col in range(min(sheet.ncols, 26)):
-            value = _get_header_text_xls(sheet, row, col)
-            if _is_day_header(value):
-                return row, col
-    return None
+    # «дата» состоит только из букв, поэтому ищется прямо в тексте ячейки.
+    # Числа и даты заголовком не бывают.
+    return isinstance(value, str) and "дата" in value.lower()
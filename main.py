@@ -4,7 +4,6 @@ import argparse
 import logging
 
 from config_loader import extract_spreadsheet_id, load_config
-from processor import process_directory
 
 
 def setup_logging() -> None:
@@ -41,6 +40,9 @@ def main() -> None:
     if not spreadsheet_id:
         raise SystemExit("Не указан spreadsheet_id и он не найден/невалиден в config.json")
 
+    # processor тянет за собой Google API и Excel-ридеры; --help и ошибки аргументов без них быстрее.
+    from processor import process_directory
+
     process_directory(
         input_dir=args.input_dir,
         period=args.period,
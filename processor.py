@@ -1,29 +1,35 @@
 from __future__ import annotations
 
 import calendar
+import contextlib
 import datetime
+import functools
+import itertools
 import logging
+import logging.handlers
+import multiprocessing
+import os
 import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable, Iterator
 
 from googleapiclient.errors import HttpError
 from google.auth.exceptions import RefreshError
 
-from excel_reader import ExcelReadError, read_excel
+from excel_reader import ExcelData, ExcelReadError, read_excel
 from sheets_client import (
-    apply_green_fill,
     build_sheets_service,
-    fetch_row_values,
     fetch_sheet_infos,
+    fetch_summary_layout,
     find_mp_sheet,
     get_last_filled_row,
-    group_imported_rows,
-    insert_row,
+    SheetInfo,
+    SummaryLayout,
     update_summary_sheet,
-    update_summary_row,
-    update_formulas,
-    update_values,
+    write_imported_rows,
 )
 
 logger = logging.getLogger(__name__)
@@ -42,7 +48,12 @@ MONTHS = [
     "ноябрь",
     "декабрь",
 ]
+MONTH_NUMBERS = {month: number for number, month in enumerate(MONTHS, start=1)}
 MONTH_REGEX = re.compile(rf"({'|'.join(MONTHS)})\s+(\d{{4}})", re.IGNORECASE)
+# Нулевой день серийных дат Excel.
+_EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+# С этого числа файлов чтение Excel окупает запуск пула процессов.
+_PROCESS_POOL_MIN_FILES = 4
 
 STORE_ALIASES = {
     "Авиаторов": ["авиаторов"],
@@ -57,13 +68,19 @@ STORE_ALIASES = {
     "ЦУМ": ["цум", "советница"],
     "Простор": ["простор"],
 }
+# Плоский список (псевдоним, магазин) в порядке STORE_ALIASES: приоритет магазинов сохраняется.
+_STORE_ALIAS_PAIRS = tuple(
+    (alias, store) for store, aliases in STORE_ALIASES.items() for alias in aliases
+)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class FileContext:
     path: Path
     store: str
     period: str
+    year: int
+    month: int
 
 
 def process_directory(
@@ -79,20 +96,27 @@ def process_directory(
         logger.error("Папка не найдена: %s", directory)
         return
 
-    files = sorted(directory.glob("*.xls")) + sorted(directory.glob("*.xlsx"))
+    files = _list_excel_files(directory)
     if not files:
         logger.warning("В папке нет файлов .xls или .xlsx")
         return
 
     service = None
     sheet_infos = []
+    mp_sheets: dict[str, SheetInfo | None] = {}
+    summary_layout: SummaryLayout | None = None
+    # Последняя заполненная строка листа МП после нашей записи известна без чтения.
+    last_rows: dict[str, int] = {}
     if not dry_run:
-        if not Path(credentials).exists():
-            logger.error("Файл credentials не найден: %s", credentials)
-            return
         try:
             service = build_sheets_service(credentials)
             sheet_infos = fetch_sheet_infos(service, spreadsheet_id)
+            # Листы МП подбираются один раз на запуск, а не для каждого файла.
+            mp_sheets = {store: find_mp_sheet(sheet_infos, store) for store in STORE_ALIASES}
+            summary_layout = fetch_summary_layout(service, spreadsheet_id, sheet_infos)
+        except FileNotFoundError:
+            logger.error("Файл credentials не найден: %s", credentials)
+            return
         except RefreshError as exc:
             logger.error(
                 "Ошибка авторизации Google (RefreshError). Проверьте credentials и доступ к таблице: %s",
@@ -104,106 +128,201 @@ def process_directory(
             return
 
     total_files = len(files)
+    contexts: list[tuple[int, Path, FileContext]] = []
     for index, file_path in enumerate(files, start=1):
         try:
             context = _build_context(file_path, period, dry_run)
         except ValueError as exc:
             logger.error("%s: %s", file_path.name, exc)
             continue
+        contexts.append((index, file_path, context))
+    if not contexts:
+        return
 
-        logger.info(
-            "Файл: %s | Магазин: %s | Период: %s",
-            file_path.name,
-            context.store,
-            context.period,
-        )
+    with _excel_readers([context.path for _, _, context in contexts]) as readers:
+        # Большие пачки Excel читаются параллельно, запись в Google Sheets остаётся последовательной.
+        for (index, file_path, context), read in zip(contexts, readers):
+            logger.info(
+                "Файл: %s | Магазин: %s | Период: %s",
+                file_path.name,
+                context.store,
+                context.period,
+            )
 
-        try:
-            excel_data = read_excel(context.path)
-        except ExcelReadError as exc:
-            logger.error("%s: %s", file_path.name, exc)
-            continue
+            try:
+                excel_data = read()
+            except ExcelReadError as exc:
+                logger.error("%s: %s", file_path.name, exc)
+                continue
+
+            logger.info(
+                "Найдены колонки: Чеки=%s, Товары=%s, Подарочные сертификаты=%s",
+                excel_data.column_map["checks"],
+                excel_data.column_map["goods"],
+                excel_data.column_map["gift_cert"],
+            )
 
-        logger.info(
-            "Найдены колонки: Чеки=%s, Товары=%s, Подарочные сертификаты=%s",
-            excel_data.column_map["checks"],
-            excel_data.column_map["goods"],
-            excel_data.column_map["gift_cert"],
-        )
+            if not excel_data.rows:
+                logger.warning("%s: нет данных для переноса", file_path.name)
+                continue
+
+            rows_to_write = _prepare_rows(excel_data.rows, context.year, context.month)
+            if not rows_to_write:
+                logger.warning("%s: после фильтрации нет данных для переноса", file_path.name)
+                continue
+
+            if dry_run:
+                logger.info("[DRY RUN] Перенесли бы %s строк", len(rows_to_write))
+                continue
+
+            sheet_info = mp_sheets.get(context.store)
+            if not sheet_info:
+                logger.error("%s: не найден лист МП для магазина '%s'", file_path.name, context.store)
+                continue
+
+            last_row = last_rows.get(sheet_info.title)
+            if last_row is None:
+                last_row = get_last_filled_row(service, spreadsheet_id, sheet_info.title)
+            summary_row = last_row + 1
+            data_start = summary_row + 1
+            data_end = summary_row + len(rows_to_write)
+
+            logger.info(
+                "Запись в лист '%s': строки %s-%s",
+                sheet_info.title,
+                data_start,
+                data_end,
+            )
 
-        if not excel_data.rows:
-            logger.warning("%s: нет данных для переноса", file_path.name)
-            continue
+            period_label = context.period.split()[0]
+            try:
+                summary_values = write_imported_rows(
+                    service,
+                    spreadsheet_id,
+                    sheet_info,
+                    summary_row,
+                    period_label,
+                    rows_to_write,
+                )
+            except HttpError as exc:
+                logger.error("Ошибка записи в '%s': %s", sheet_info.title, exc)
+                continue
+            last_rows[sheet_info.title] = data_end
+            update_summary_sheet(
+                service,
+                spreadsheet_id,
+                summary_layout,
+                sheet_info.title,
+                summary_values,
+                _format_period_label(context.year, context.month),
+            )
 
-        rows_to_write = _prepare_rows(excel_data.rows, context.period)
-        if not rows_to_write:
-            logger.warning("%s: после фильтрации нет данных для переноса", file_path.name)
-            continue
+            logger.info("%s: успешно перенесено строк: %s", file_path.name, len(rows_to_write))
+            if progress_callback:
+                progress_callback(index, total_files, file_path.name)
+
+
+def _list_excel_files(directory: Path) -> list[Path]:
+    """Файлы .xls, затем .xlsx, каждые по имени — за один проход по папке."""
+    # normcase повторяет регистрозависимость glob: на Windows .XLS тоже подходит.
+    with os.scandir(directory) as entries:
+        files = [
+            Path(entry.path)
+            for entry in entries
+            if os.path.normcase(entry.name).endswith((".xls", ".xlsx")) and entry.is_file()
+        ]
+    files.sort(key=lambda path: (os.path.normcase(path.suffix) == ".xlsx", path))
+    return files
+
+
+@contextlib.contextmanager
+def _excel_readers(paths: list[Path]) -> Iterator[list[Callable[[], ExcelData]]]:
+    """Функции чтения файлов по порядку; пул процессов поднимается только для больших пачек.
+
+    Запуск spawn-воркеров стоит десятые доли секунды (каждый заново импортирует
+    processor и Google API клиент), поэтому несколько файлов читаются в текущем процессе.
+    """
+    if len(paths) < _PROCESS_POOL_MIN_FILES:
+        yield [functools.partial(read_excel, path) for path in paths]
+        return
+    with _excel_reader_pool(len(paths)) as executor:
+        yield [executor.submit(_read_excel_in_worker, path).result for path in paths]
+
+
+@contextlib.contextmanager
+def _excel_reader_pool(file_count: int) -> Iterator[ProcessPoolExecutor]:
+    """Пул процессов для чтения Excel; логи воркеров пересылаются в текущий процесс.
+
+    Воркеры запускаются через spawn: fork копировал бы многопоточный процесс
+    (сервер Streamlit, поток импорта) вместе с захваченными блокировками.
+    """
+    mp_context = multiprocessing.get_context("spawn")
+    log_queue = mp_context.Queue()
+    listener = logging.handlers.QueueListener(log_queue, _ForwardLogHandler())
+    listener.start()
+    workers = max(1, min(file_count, os.cpu_count() or 1))
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp_context,
+            initializer=_init_worker_logging,
+            initargs=(log_queue,),
+        ) as executor:
+            yield executor
+    finally:
+        listener.stop()
+        log_queue.close()
+        log_queue.join_thread()
+
+
+class _WorkerFileFilter(logging.Filter):
+    """Добавляет к записям воркера имя читаемого файла: они приходят вперемешку с логами файлов."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.file_name: str | None = None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.file_name:
+            record.msg = f"{self.file_name}: {record.getMessage()}"
+            record.args = None
+        return True
 
-        if dry_run:
-            logger.info("[DRY RUN] Перенесли бы %s строк", len(rows_to_write))
-            continue
 
-        sheet_info = find_mp_sheet(sheet_infos, context.store)
-        if not sheet_info:
-            logger.error("%s: не найден лист МП для магазина '%s'", file_path.name, context.store)
-            continue
+_worker_file_filter = _WorkerFileFilter()
 
-        last_row = get_last_filled_row(service, spreadsheet_id, sheet_info.title)
-        summary_row = last_row + 1
-        data_start = summary_row + 1
-        data_end = summary_row + len(rows_to_write)
 
-        logger.info(
-            "Запись в лист '%s': строки %s-%s",
-            sheet_info.title,
-            data_start,
-            data_end,
-        )
+def _init_worker_logging(log_queue) -> None:
+    handler = logging.handlers.QueueHandler(log_queue)
+    handler.addFilter(_worker_file_filter)
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(logging.INFO)
 
-        try:
-            insert_row(service, spreadsheet_id, sheet_info.sheet_id, summary_row)
-            apply_green_fill(service, spreadsheet_id, sheet_info.sheet_id, summary_row)
-        except HttpError as exc:
-            logger.error("Ошибка вставки строки в '%s': %s", sheet_info.title, exc)
-            continue
-        period_label = context.period.split()[0]
-        try:
-            update_summary_row(
-                service,
-                spreadsheet_id,
-                sheet_info.title,
-                summary_row,
-                period_label,
-                data_start,
-                data_end,
-            )
-        except HttpError as exc:
-            logger.error("Ошибка обновления сводной строки в '%s': %s", sheet_info.title, exc)
-            continue
-        update_values(service, spreadsheet_id, sheet_info.title, data_start, rows_to_write)
-        update_formulas(service, spreadsheet_id, sheet_info.title, data_start, data_end)
-        group_imported_rows(
-            service,
-            spreadsheet_id,
-            sheet_info.sheet_id,
-            start_row_1based=data_start,
-            end_row_1based=data_end,
-            excluded_row_1based=summary_row,
-        )
-        summary_values = fetch_row_values(service, spreadsheet_id, sheet_info.title, summary_row)
-        update_summary_sheet(
-            service,
-            spreadsheet_id,
-            sheet_infos,
-            sheet_info.title,
-            summary_values,
-            _format_period_label(period),
-        )
-
-        logger.info("%s: успешно перенесено строк: %s", file_path.name, len(rows_to_write))
-        if progress_callback:
-            progress_callback(index, total_files, file_path.name)
+
+def _read_excel_in_worker(path: Path) -> ExcelData:
+    _worker_file_filter.file_name = path.name
+    try:
+        return read_excel(path)
+    finally:
+        _worker_file_filter.file_name = None
+
+
+class _ForwardLogHandler(logging.Handler):
+    """Передаёт записи из воркеров обработчикам логгера основного процесса.
+
+    Записи помечаются потоком, открывшим пул, чтобы обработчики, различающие
+    потоки (например, журнал сессии в UI), относили их к нужному импорту.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._owner = threading.current_thread()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        record.thread = self._owner.ident
+        record.threadName = self._owner.name
+        logging.getLogger(record.name).handle(record)
 
 
 def _build_context(file_path: Path, fallback_period: str | None, dry_run: bool) -> FileContext:
@@ -215,15 +334,17 @@ def _build_context(file_path: Path, fallback_period: str | None, dry_run: bool)
     period = detected_period or fallback_period
     if not period:
         raise ValueError("Не найден период в названии и не указан период вручную")
+    # Период разбирается один раз; неверный период отсеивает файл до переименования.
+    year, month = _parse_period(period)
 
     new_path = _maybe_rename(file_path, period, detected_period, dry_run)
-    return FileContext(path=new_path, store=store, period=period)
+    return FileContext(path=new_path, store=store, period=period, year=year, month=month)
 
 
 def _detect_store(filename: str) -> str | None:
     lower_name = filename.lower()
-    for store, aliases in STORE_ALIASES.items():
-        if any(alias in lower_name for alias in aliases):
+    for alias, store in _STORE_ALIAS_PAIRS:
+        if alias in lower_name:
             return store
     return None
 
@@ -263,18 +384,13 @@ def _maybe_rename(
     return new_path
 
 
-def _prepare_rows(rows: list[list], period: str) -> list[list]:
+def _prepare_rows(rows: list[list], year: int, month: int) -> list[list]:
     """Форматирует дату и ограничивает количество строк по числу дней в месяце."""
-    year, month = _parse_period(period)
     days_in_month = calendar.monthrange(year, month)[1]
-    prepared: list[list] = []
-    for row in rows:
-        if len(prepared) >= days_in_month:
-            break
-        new_row = list(row)
-        new_row[0] = _format_date_value(new_row[0])
-        prepared.append(new_row)
-    return prepared
+    return [
+        [_format_date_value(row[0]), *row[1:]]
+        for row in itertools.islice(rows, days_in_month)
+    ]
 
 
 def _parse_period(period: str) -> tuple[int, int]:
@@ -284,68 +400,82 @@ def _parse_period(period: str) -> tuple[int, int]:
         raise ValueError(f"Некорректный период: {period}")
     month_name = parts[0].lower()
     year = int(parts[1])
-    month_map = {
-        "январь": 1,
-        "февраль": 2,
-        "март": 3,
-        "апрель": 4,
-        "май": 5,
-        "июнь": 6,
-        "июль": 7,
-        "август": 8,
-        "сентябрь": 9,
-        "октябрь": 10,
-        "ноябрь": 11,
-        "декабрь": 12,
-    }
-    if month_name not in month_map:
+    month = MONTH_NUMBERS.get(month_name)
+    if month is None:
         raise ValueError(f"Неизвестный месяц в периоде: {period}")
-    return year, month_map[month_name]
+    return year, month
 
 
-def _format_period_label(period: str) -> str:
+def _format_period_label(year: int, month: int) -> str:
     """Возвращает период в формате ММ-ГГГГ."""
-    year, month = _parse_period(period)
     return f"{month:02d}-{year}"
 
 
 def _format_date_value(value) -> str | None:
     """Приводит дату к формату ДД.ММ.ГГГГ."""
+    # Обработчик ищется по точному типу; подклассы (bool, pandas.Timestamp и т. п.)
+    # разбираются через isinstance.
+    formatter = _DATE_FORMATTERS.get(type(value)) or _date_formatter_for(value)
+    return formatter(value)
+
+
+def _date_formatter_for(value):
     if value is None:
-        return None
-    if isinstance(value, datetime.datetime):
-        return value.strftime("%d.%m.%Y")
+        return _format_empty_date
     if isinstance(value, datetime.date):
-        return value.strftime("%d.%m.%Y")
+        return _format_date_object
     if isinstance(value, (int, float)):
-        try:
-            base = datetime.datetime(1899, 12, 30)
-            converted = base + datetime.timedelta(days=float(value))
-            return converted.strftime("%d.%m.%Y")
-        except (OverflowError, ValueError):
-            return str(value)
+        return _format_excel_serial
+    return _format_date_text
+
+
+def _format_empty_date(value) -> None:
+    return None
+
+
+def _format_date_object(value: datetime.date) -> str:
+    # Три поля форматируются напрямую, без strftime и его разбора формата.
+    return f"{value.day:02d}.{value.month:02d}.{value.year}"
+
+
+def _format_excel_serial(value: int | float) -> str:
+    try:
+        converted = _EXCEL_EPOCH + datetime.timedelta(days=float(value))
+        return _format_date_object(converted)
+    except (OverflowError, ValueError):
+        return str(value)
+
+
+def _format_date_text(value) -> str | None:
     text = str(value).strip()
     if not text:
         return None
-    if _is_number(text):
+    # Число разбирается один раз. Текст с запятой («45000,5») float не примет,
+    # и, как и раньше, он вернётся без изменений после неудачного strptime.
+    try:
+        serial = float(text)
+    except ValueError:
+        serial = None
+    if serial is not None:
         try:
-            base = datetime.datetime(1899, 12, 30)
-            converted = base + datetime.timedelta(days=float(text))
-            return converted.strftime("%d.%m.%Y")
+            converted = _EXCEL_EPOCH + datetime.timedelta(days=serial)
+            return _format_date_object(converted)
         except (OverflowError, ValueError):
             return text
     for fmt in ("%d.%m.%Y", "%d.%m.%y"):
         try:
             parsed = datetime.datetime.strptime(text, fmt)
-            return parsed.strftime("%d.%m.%Y")
+            return _format_date_object(parsed)
         except ValueError:
             continue
     return text
 
 
-def _is_number(value: str) -> bool:
-    try:
-        float(value.replace(",", "."))
-        return True
-    except ValueError:
-        return False
+_DATE_FORMATTERS = {
+    type(None): _format_empty_date,
+    datetime.datetime: _format_date_object,
+    datetime.date: _format_date_object,
+    int: _format_excel_serial,
+    float: _format_excel_serial,
+    str: _format_date_text,
+}
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import logging
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any, Optional
 
 from googleapiclient.errors import HttpError
@@ -13,11 +13,65 @@ logger = logging.getLogger(__name__)
 
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 
-
-@dataclass
+_MP_SHEET_KEYWORDS = {
+    "цум": ("цум", "советница"),
+    "диамант": ("диамант", "цитрус"),
+    "козловская": ("козловская", "санвэй", "санвей"),
+    "парк хаус": ("парк хаус", "паркхаус"),
+    "стройград": ("стройград", "строй град"),
+}
+_SUMMARY_FIRST_ROW = 65
+# Порядок важен: возвращается первое совпадение.
+_SUMMARY_STORE_KEYWORDS = (
+    "авиаторов",
+    "козловская",
+    "цитрус",
+    "привоз",
+    "простор",
+    "бахтурова",
+    "ахтубинск",
+    "стройград",
+    "цум",
+    "европа",
+    "парк хаус",
+)
+
+
+@dataclass(frozen=True, slots=True)
 class SheetInfo:
     sheet_id: int
     title: str
+    # Нормализованное название для поиска листов: считается один раз, а не на каждое сравнение.
+    title_key: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "title_key", _normalize_text(self.title or ""))
+
+
+@dataclass(frozen=True, slots=True)
+class SummaryLayout:
+    """Лист «Сводная» и блоки магазинов его 1-й строки: (колонка начала, нормализованный текст).
+
+    filled_rows — занятые строки каждого блока начиная с _SUMMARY_FIRST_ROW; пополняется
+    после каждой записи, чтобы свободная строка находилась без чтения листа.
+    """
+
+    info: SheetInfo
+    blocks: tuple[tuple[int, str], ...]
+    filled_rows: dict[int, set[int]]
+
+    def block_start(self, keyword: str) -> Optional[int]:
+        for start_col, text in self.blocks:
+            if keyword in text:
+                return start_col
+        return None
+
+    def first_empty_row(self, block_start: int) -> int:
+        filled = self.filled_rows.setdefault(block_start, set())
+        row = _SUMMARY_FIRST_ROW
+        while row in filled:
+            row += 1
+        return row
 
 
 def build_sheets_service(credentials_path: str):
@@ -30,7 +84,7 @@ def build_sheets_service(credentials_path: str):
 def fetch_sheet_infos(service, spreadsheet_id: str) -> list[SheetInfo]:
     response = (
         service.spreadsheets()
-        .get(spreadsheetId=spreadsheet_id, fields="sheets.properties")
+        .get(spreadsheetId=spreadsheet_id, fields="sheets.properties(sheetId,title)")
         .execute()
     )
     sheet_infos = []
@@ -42,22 +96,11 @@ def fetch_sheet_infos(service, spreadsheet_id: str) -> list[SheetInfo]:
 
 def find_mp_sheet(sheet_infos: list[SheetInfo], store_name: str) -> SheetInfo | None:
     store_lower = store_name.lower()
-    candidates = [
-        info
-        for info in sheet_infos
-        if info.title and info.title.lower().strip().startswith("мп")
-    ]
-    keywords_map = {
-        "цум": ["цум", "советница"],
-        "диамант": ["диамант", "цитрус"],
-        "козловская": ["козловская", "санвэй", "санвей"],
-        "парк хаус": ["парк хаус", "паркхаус"],
-        "стройград": ["стройград", "строй град"],
-    }
-    keywords = keywords_map.get(store_lower, [store_lower])
-    for info in candidates:
-        title_lower = info.title.lower()
-        if any(keyword in title_lower for keyword in keywords):
+    keywords = _MP_SHEET_KEYWORDS.get(store_lower, (store_lower,))
+    for info in sheet_infos:
+        if info.title_key.startswith("мп") and any(
+            keyword in info.title_key for keyword in keywords
+        ):
             return info
     return None
 
@@ -71,135 +114,157 @@ def get_last_filled_row(service, spreadsheet_id: str, sheet_title: str) -> int:
         .execute()
     )
     values = response.get("values", [])
-    last_row = 0
-    for idx, row in enumerate(values, start=1):
-        if any(cell not in (None, "") for cell in row):
-            last_row = idx
-    return last_row
+    # Скан снизу: values.get уже отбросил пустой хвост, обычно хватает одной строки.
+    for idx in range(len(values), 0, -1):
+        if any(cell not in (None, "") for cell in values[idx - 1]):
+            return idx
+    return 0
 
 
-def apply_green_fill(service, spreadsheet_id: str, sheet_id: int, row_index: int) -> None:
+def write_imported_rows(
+    service,
+    spreadsheet_id: str,
+    sheet_info: SheetInfo,
+    summary_row: int,
+    period_label: str,
+    rows: list[list[Any]],
+) -> list[Any]:
+    """Записывает зелёную сводную строку и строки файла одним batchUpdate.
+
+    Вставка строки, заливка, сводные формулы, данные с формулами колонки E и
+    группировка применяются по порядку в одном запросе; batchUpdate атомарен,
+    поэтому при ошибке лист остаётся нетронутым. Возвращает вычисленные значения
+    сводной строки (как values.get с UNFORMATTED_VALUE) из ответа того же запроса.
+    """
+    sheet_id = sheet_info.sheet_id
+    data_start = summary_row + 1
+    data_end = summary_row + len(rows)
     requests = [
-        {
-            "repeatCell": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "startRowIndex": row_index - 1,
-                    "endRowIndex": row_index,
-                    "startColumnIndex": 0,
-                    "endColumnIndex": 8,
-                },
-                "cell": {
-                    "userEnteredFormat": {
-                        "backgroundColor": {"red": 0.76, "green": 0.87, "blue": 0.78}
-                    }
-                },
-                "fields": "userEnteredFormat.backgroundColor",
-            }
-        }
+        _insert_row_request(sheet_id, summary_row),
+        _green_fill_request(sheet_id, summary_row),
+        _summary_row_request(sheet_id, summary_row, period_label, data_start, data_end),
+        _data_rows_request(sheet_id, data_start, rows),
     ]
-    body = {"requests": requests}
-    _execute_with_retry(
-        lambda: service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body=body).execute()
+    group_range = _imported_group_range(data_start, data_end, excluded_row_1based=summary_row)
+    if group_range is not None:
+        requests.append(_add_group_request(sheet_id, *group_range))
+
+    body = {
+        "requests": requests,
+        # Сводная строка возвращается уже пересчитанной — отдельное чтение не нужно.
+        "includeSpreadsheetInResponse": True,
+        "responseRanges": [f"'{sheet_info.title}'!A{summary_row}:H{summary_row}"],
+        "responseIncludeGridData": True,
+    }
+    response = _execute_with_retry(
+        lambda: service.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body=body,
+            fields="replies,updatedSpreadsheet.sheets.data.rowData.values(effectiveValue,formattedValue)",
+        ).execute()
     )
+    if group_range is not None:
+        replies = response.get("replies", [])
+        group_reply = replies[len(requests) - 1] if len(replies) >= len(requests) else {}
+        _collapse_group(service, spreadsheet_id, group_reply, *group_range, summary_row)
+    return _first_row_values(response.get("updatedSpreadsheet", {}))
+
+
+def _insert_row_request(sheet_id: int, row_index: int) -> dict:
+    return {
+        "insertDimension": {
+            "range": {
+                "sheetId": sheet_id,
+                "dimension": "ROWS",
+                "startIndex": row_index - 1,
+                "endIndex": row_index,
+            },
+            "inheritFromBefore": False,
+        }
+    }
 
 
-def insert_row(service, spreadsheet_id: str, sheet_id: int, row_index: int) -> None:
-    requests = [
-        {
-            "insertDimension": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "ROWS",
-                    "startIndex": row_index - 1,
-                    "endIndex": row_index,
-                },
-                "inheritFromBefore": False,
-            }
+def _green_fill_request(sheet_id: int, row_index: int) -> dict:
+    return {
+        "repeatCell": {
+            "range": {
+                "sheetId": sheet_id,
+                "startRowIndex": row_index - 1,
+                "endRowIndex": row_index,
+                "startColumnIndex": 0,
+                "endColumnIndex": 8,
+            },
+            "cell": {
+                "userEnteredFormat": {
+                    "backgroundColor": {"red": 0.76, "green": 0.87, "blue": 0.78}
+                }
+            },
+            "fields": "userEnteredFormat.backgroundColor",
         }
-    ]
-    body = {"requests": requests}
-    _execute_with_retry(
-        lambda: service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body=body).execute()
-    )
+    }
 
 
-def update_summary_row(
-    service,
-    spreadsheet_id: str,
-    sheet_title: str,
+def _summary_row_request(
+    sheet_id: int,
     summary_row: int,
     period_label: str,
     data_start: int,
     data_end: int,
-) -> None:
+) -> dict:
     values = [
-        [
-            period_label,
-            "",
-            f"=SUM(C{data_start}:C{data_end})",
-            f"=SUM(D{data_start}:D{data_end})",
-            f"=AVERAGE(E{data_start}:E{data_end})",
-            f"=SUM(F{data_start}:F{data_end})",
-            f"=SUM(G{data_start}:G{data_end})",
-            f"=SUM(H{data_start}:H{data_end})",
-        ]
+        _cell_data(period_label),
+        _cell_data(""),
+        _formula_cell(f"=SUM(C{data_start}:C{data_end})"),
+        _formula_cell(f"=SUM(D{data_start}:D{data_end})"),
+        _formula_cell(f"=AVERAGE(E{data_start}:E{data_end})"),
+        _formula_cell(f"=SUM(F{data_start}:F{data_end})"),
+        _formula_cell(f"=SUM(G{data_start}:G{data_end})"),
+        _formula_cell(f"=SUM(H{data_start}:H{data_end})"),
     ]
-    range_name = f"'{sheet_title}'!A{summary_row}:H{summary_row}"
-    body = {"values": values}
-    _execute_with_retry(lambda: service.spreadsheets().values().update(
-        spreadsheetId=spreadsheet_id,
-        range=range_name,
-        valueInputOption="USER_ENTERED",
-        body=body,
-    ).execute())
+    return _update_cells_request(sheet_id, summary_row, [values])
 
 
-def update_values(
-    service,
-    spreadsheet_id: str,
-    sheet_title: str,
-    start_row: int,
-    rows: list[list[Any]],
-) -> None:
-    end_row = start_row + len(rows) - 1
-    range_name = f"'{sheet_title}'!A{start_row}:H{end_row}"
-    body = {"values": rows}
-    _execute_with_retry(lambda: service.spreadsheets().values().update(
-        spreadsheetId=spreadsheet_id,
-        range=range_name,
-        valueInputOption="RAW",
-        body=body,
-    ).execute())
-
-
-def update_formulas(
-    service,
-    spreadsheet_id: str,
-    sheet_title: str,
-    start_row: int,
-    end_row: int,
-) -> None:
-    formulas = [[f"=C{row}/D{row}"] for row in range(start_row, end_row + 1)]
-    range_name = f"'{sheet_title}'!E{start_row}:E{end_row}"
-    body = {"values": formulas}
-    _execute_with_retry(lambda: service.spreadsheets().values().update(
-        spreadsheetId=spreadsheet_id,
-        range=range_name,
-        valueInputOption="USER_ENTERED",
-        body=body,
-    ).execute())
-
-
-def group_imported_rows(
-    service,
-    spreadsheet_id: str,
-    sheet_id: int,
+def _data_rows_request(sheet_id: int, start_row: int, rows: list[list[Any]]) -> dict:
+    """Значения пишутся как есть (аналог RAW), в колонку E — формула =C/D."""
+    cell_rows = []
+    for row_index, row in enumerate(rows, start=start_row):
+        values = [_cell_data(value) for value in row]
+        values[4] = _formula_cell(f"=C{row_index}/D{row_index}")
+        cell_rows.append(values)
+    return _update_cells_request(sheet_id, start_row, cell_rows)
+
+
+def _update_cells_request(sheet_id: int, start_row: int, cell_rows: list[list[dict]]) -> dict:
+    return {
+        "updateCells": {
+            "start": {"sheetId": sheet_id, "rowIndex": start_row - 1, "columnIndex": 0},
+            "rows": [{"values": values} for values in cell_rows],
+            "fields": "userEnteredValue",
+        }
+    }
+
+
+def _cell_data(value: Any) -> dict:
+    """CellData для значения без разбора строк: пустые ячейки очищаются."""
+    if value is None or value == "":
+        return {}
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+
+def _formula_cell(formula: str) -> dict:
+    return {"userEnteredValue": {"formulaValue": formula}}
+
+
+def _imported_group_range(
     start_row_1based: int,
     end_row_1based: int,
     excluded_row_1based: int | None = None,
-) -> None:
-    """Группирует импортированные строки, исключая зелёную строку."""
+) -> tuple[int, int] | None:
+    """Диапазон группировки импортированных строк без зелёной строки (или None)."""
     group_start = start_row_1based
     group_end = end_row_1based
 
@@ -214,60 +279,81 @@ def group_imported_rows(
                 start_row_1based,
                 end_row_1based,
             )
-            return
+            return None
 
     if group_start > group_end:
         logger.info(
             "Группировка не выполнена: пустой диапазон после исключения строки %s",
             excluded_row_1based,
         )
-        return
+        return None
+    return group_start, group_end
 
-    requests = [
-        {
-            "addDimensionGroup": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "dimension": "ROWS",
-                    "startIndex": group_start - 1,
-                    "endIndex": group_end,
-                }
+
+def _add_group_request(sheet_id: int, group_start: int, group_end: int) -> dict:
+    return {
+        "addDimensionGroup": {
+            "range": {
+                "sheetId": sheet_id,
+                "dimension": "ROWS",
+                "startIndex": group_start - 1,
+                "endIndex": group_end,
             }
-        },
-    ]
-    body = {"requests": requests}
-    response = _execute_with_retry(
-        lambda: service.spreadsheets().batchUpdate(
-        spreadsheetId=spreadsheet_id,
-        body=body,
-    ).execute()
-    )
+        }
+    }
 
-    group_id = (
-        response.get("replies", [{}])[0]
-        .get("addDimensionGroup", {})
-        .get("dimensionGroup", {})
-        .get("groupId")
+
+def _collapse_group(
+    service,
+    spreadsheet_id: str,
+    group_reply: dict,
+    group_start: int,
+    group_end: int,
+    excluded_row_1based: int,
+) -> None:
+    """Сворачивает добавленную группу отдельным запросом.
+
+    Строки к этому моменту уже записаны, поэтому ошибка здесь только
+    логируется: несвёрнутая группа не должна срывать обновление «Сводной».
+    """
+    # В ответе addDimensionGroup — все группы листа; наша ищется по диапазону,
+    # а её глубина нужна, чтобы updateDimensionGroup нашёл группу.
+    group = next(
+        (
+            dimension_group
+            for dimension_group in group_reply.get("addDimensionGroup", {}).get("dimensionGroups", [])
+            if dimension_group.get("range", {}).get("startIndex") == group_start - 1
+            and dimension_group.get("range", {}).get("endIndex") == group_end
+        ),
+        None,
     )
-    if group_id is None:
-        logger.info("Не удалось получить groupId для группировки строк %s-%s", group_start, group_end)
+    if group is None:
+        logger.info("Не удалось найти добавленную группу строк %s-%s", group_start, group_end)
         return
     collapse_body = {
         "requests": [
             {
                 "updateDimensionGroup": {
-                    "dimensionGroup": {"groupId": group_id, "collapsed": True},
+                    "dimensionGroup": {
+                        "range": group["range"],
+                        "depth": group.get("depth", 1),
+                        "collapsed": True,
+                    },
                     "fields": "collapsed",
                 }
             }
         ]
     }
-    _execute_with_retry(
-        lambda: service.spreadsheets().batchUpdate(
-        spreadsheetId=spreadsheet_id,
-        body=collapse_body,
-    ).execute()
-    )
+    try:
+        _execute_with_retry(
+            lambda: service.spreadsheets().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body=collapse_body,
+            ).execute()
+        )
+    except HttpError as exc:
+        logger.warning("Не удалось свернуть группу строк %s-%s: %s", group_start, group_end, exc)
+        return
     logger.info(
         "Сгруппированы строки %s-%s (зелёная строка: %s)",
         group_start,
@@ -276,62 +362,56 @@ def group_imported_rows(
     )
 
 
-def fetch_row_values(
-    service,
-    spreadsheet_id: str,
-    sheet_title: str,
-    row_index: int,
-) -> list[Any]:
-    range_name = f"'{sheet_title}'!A{row_index}:H{row_index}"
-    response = (
-        service.spreadsheets()
-        .values()
-        .get(
-            spreadsheetId=spreadsheet_id,
-            range=range_name,
-            valueRenderOption="UNFORMATTED_VALUE",
-        )
-        .execute()
-    )
-    values = response.get("values", [])
-    return values[0] if values else []
+def _first_row_values(spreadsheet: dict) -> list[Any]:
+    """Первая строка grid data в виде, который отдаёт values.get с UNFORMATTED_VALUE."""
+    for sheet in spreadsheet.get("sheets", []):
+        for data in sheet.get("data", []):
+            for row in data.get("rowData", []):
+                values = [_unformatted_value(cell) for cell in row.get("values", [])]
+                # values.get не возвращает пустые ячейки в конце строки.
+                while values and values[-1] == "":
+                    values.pop()
+                return values
+    return []
+
+
+def _unformatted_value(cell: dict) -> Any:
+    value = cell.get("effectiveValue")
+    if not value:
+        return ""
+    if "errorValue" in value:
+        # Ошибки формул values.get отдаёт текстом, например «#DIV/0!».
+        return cell.get("formattedValue", "")
+    for key in ("numberValue", "stringValue", "boolValue"):
+        if key in value:
+            return value[key]
+    return ""
 
 
 def update_summary_sheet(
     service,
     spreadsheet_id: str,
-    sheet_infos: list[SheetInfo],
+    summary_layout: SummaryLayout | None,
     source_sheet_title: str,
     source_row: list[Any],
     period_label: str,
 ) -> None:
-    summary_info = _find_summary_sheet(sheet_infos)
-    if not summary_info:
+    if not summary_layout:
         logger.warning("Не найден лист 'Сводная'")
         return
+    summary_info = summary_layout.info
 
     keyword = _extract_store_keyword(source_sheet_title)
     if not keyword:
         logger.warning("Не удалось определить магазин для листа '%s'", source_sheet_title)
         return
 
-    block_start = _find_summary_block_start(service, spreadsheet_id, summary_info, keyword)
+    block_start = summary_layout.block_start(keyword)
     if block_start is None:
         logger.warning("Не найдён блок '%s' в листе 'Сводная'", keyword)
         return
 
-    block_end = block_start + 7
-    target_row = _find_first_empty_row(
-        service,
-        spreadsheet_id,
-        summary_info.title,
-        block_start,
-        block_end,
-    )
-    if target_row is None:
-        logger.warning("Не удалось найти свободную строку для листа 'Сводная'")
-        return
-
+    target_row = summary_layout.first_empty_row(block_start)
     values = [
         [
             period_label,
@@ -356,42 +436,33 @@ def update_summary_sheet(
             body={"values": values},
         ).execute()
     )
+    summary_layout.filled_rows[block_start].add(target_row)
 
 
 def _find_summary_sheet(sheet_infos: list[SheetInfo]) -> SheetInfo | None:
     for info in sheet_infos:
-        if info.title and info.title.strip().lower() == "сводная":
+        if info.title_key == "сводная":
             return info
     return None
 
 
 def _extract_store_keyword(sheet_title: str) -> Optional[str]:
     title_lower = sheet_title.lower()
-    candidates = [
-        "авиаторов",
-        "козловская",
-        "цитрус",
-        "привоз",
-        "простор",
-        "бахтурова",
-        "ахтубинск",
-        "стройград",
-        "цум",
-        "европа",
-        "парк хаус",
-    ]
-    for keyword in candidates:
+    for keyword in _SUMMARY_STORE_KEYWORDS:
         if keyword in title_lower:
             return keyword
     return None
 
 
-def _find_summary_block_start(
+def fetch_summary_layout(
     service,
     spreadsheet_id: str,
-    summary_info: SheetInfo,
-    keyword: str,
-) -> Optional[int]:
+    sheet_infos: list[SheetInfo],
+) -> SummaryLayout | None:
+    """Читает лист «Сводная» один раз на запуск: шапку блоков и занятые строки под ними."""
+    summary_info = _find_summary_sheet(sheet_infos)
+    if not summary_info:
+        return None
     response = (
         service.spreadsheets()
         .get(
@@ -404,7 +475,7 @@ def _find_summary_block_start(
     )
     sheets = response.get("sheets", [])
     if not sheets:
-        return None
+        return SummaryLayout(info=summary_info, blocks=(), filled_rows={})
     sheet_data = sheets[0]
     merges = sheet_data.get("merges", [])
     row_data = sheet_data.get("data", [])
@@ -412,51 +483,58 @@ def _find_summary_block_start(
     if row_data and row_data[0].get("rowData"):
         row_values = row_data[0]["rowData"][0].get("values", [])
 
+    blocks = []
     for merged in merges:
         if merged.get("startRowIndex") != 0:
             continue
         start_col = merged.get("startColumnIndex", 0)
-        cell_text = _get_row_value_text(row_values, start_col)
-        if keyword in cell_text:
-            return start_col
-    return None
-
-
-def _get_row_value_text(values: list[dict], col_index: int) -> str:
-    if col_index >= len(values):
-        return ""
-    value = values[col_index].get("effectiveValue") or {}
-    text = (
-        value.get("stringValue")
-        or values[col_index].get("formattedValue")
-        or ""
+        blocks.append((start_col, _get_row_value_text(row_values, start_col)))
+    filled_rows = _fetch_filled_block_rows(
+        service, spreadsheet_id, summary_info.title, [start_col for start_col, _ in blocks]
     )
-    return _normalize_text(str(text))
+    return SummaryLayout(info=summary_info, blocks=tuple(blocks), filled_rows=filled_rows)
 
 
-def _find_first_empty_row(
+def _fetch_filled_block_rows(
     service,
     spreadsheet_id: str,
     sheet_title: str,
-    start_col: int,
-    end_col: int,
-) -> Optional[int]:
-    start_row = 65
-    range_name = (
+    block_starts: list[int],
+) -> dict[int, set[int]]:
+    """Занятые строки всех блоков одним values.batchGet."""
+    if not block_starts:
+        return {}
+    ranges = [
         f"'{sheet_title}'!"
-        f"{_column_to_letter(start_col + 1)}{start_row}:{_column_to_letter(end_col)}"
-    )
+        f"{_column_to_letter(start_col + 1)}{_SUMMARY_FIRST_ROW}:{_column_to_letter(start_col + 7)}"
+        for start_col in block_starts
+    ]
     response = (
         service.spreadsheets()
         .values()
-        .get(spreadsheetId=spreadsheet_id, range=range_name)
+        .batchGet(spreadsheetId=spreadsheet_id, ranges=ranges)
         .execute()
     )
-    values = response.get("values", [])
-    for idx, row in enumerate(values, start=start_row):
-        if not any(cell not in (None, "") for cell in row):
-            return idx
-    return len(values) + start_row
+    filled_rows = {}
+    for start_col, value_range in zip(block_starts, response.get("valueRanges", [])):
+        filled_rows[start_col] = {
+            idx
+            for idx, row in enumerate(value_range.get("values", []), start=_SUMMARY_FIRST_ROW)
+            if any(cell not in (None, "") for cell in row)
+        }
+    return filled_rows
+
+
+def _get_row_value_text(values: list[dict], col_index: int) -> str:
+    if col_index >= len(values):
+        return ""
+    value = values[col_index].get("effectiveValue") or {}
+    text = (
+        value.get("stringValue")
+        or values[col_index].get("formattedValue")
+        or ""
+    )
+    return _normalize_text(str(text))
 
 
 def _get_cell_value(row: list[Any], index: int) -> Any:
@@ -481,7 +559,7 @@ def _column_to_letter(column_index: int) -> str:
 
 
 def _normalize_text(text: str) -> str:
-    return " ".join(text.replace("\u00a0", " ").lower().split())
+    return " ".join(text.replace("\u00a0", " ").casefold().split())
 
 
 def _execute_with_retry(func, retries: int = 3, delay_s: float = 1.5):